@@ -4,39 +4,72 @@
 # It includes visualizations and statistical tests to understand the relationship between industry type and information type.
 # ---------------------------------------------------------
 
-import pandas as pd
-import numpy as np
-from scipy.stats import chi2_contingency
+import argparse
 import seaborn as sns
 import matplotlib.pyplot as plt
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data.streaming import load_cubes
+from stats.contingency import ContingencyTable
+from stats.permutation import permutation_chi2
+from plotting.rendering import figure
+from plotting.fanout import RenderTask, render_all
+from instrumentation.stages import stage
+
+# Permutations of the permutation chi-square test (stops earlier once the p-value is precise enough)
+PERMUTATIONS = 20000
+
+def print_association(contingency, permutation=False):
+    """Print the chi-square test and Cramér's V of a ContingencyTable."""
+    chi2, p, dof, expected = contingency.chi2()
+    print(f"Chi-Square Statistic: {chi2:.2f}")
+    # Many sparse cells make the asymptotic p-value unreliable, hence the permutation test
+    print(f"p-value (asymptotic): {p:.3e} ({(expected < 5).mean():.0%} of cells expect fewer than 5 breaches)")
+    if permutation:
+        result = permutation_chi2(contingency.observed(), permutations=PERMUTATIONS)
+        low, high = result.ci
+        print(f"p-value (permutation): {result.pvalue:.6f} "
+              f"({result.confidence:.0%} CI {low:.6f}-{high:.6f}, {result.permutations} permutations)")
+    print(f"Cramér’s V: {contingency.cramers_v(chi2):.4f}")
+
+def plot_sensitivity_shares(percentages, color, title):
+    """Sector shares (%) of one data sensitivity level (one render task of the sensitivity loop)."""
+    percentages.plot(
+        kind='bar',
+        color=color,
+        edgecolor='black'
+    )
+
+    plt.title(title, fontsize=14, fontweight='bold')
+    plt.xlabel("Sector", fontsize=12, fontweight='bold')
+    plt.ylabel("Percentage (%)", fontsize=12, fontweight='bold')
+    plt.ylim(0, 100)
+    plt.grid(axis='y', linestyle='--', alpha=0.7)
+    plt.tight_layout()
+    plt.xticks(fontsize=10.5, fontweight='bold')
+
+def main(permutation=False, streaming=False):
+    # Aggregate cubes of both datasets: cached, or folded chunk by chunk from a feed too large for memory
+    # (the opt-in permutation test expands the counts into one row per breach; leave it off on such feeds)
+    with stage("load"):
+        cubes = load_cubes(['washington', 'kaggle'], streaming)
 
-def main():
     # LOCAL DATASET
-    # Loading and Cleaning
-    washington_dataset = pd.read_csv("data/Washington_DB.csv")
-    df_clean = washington_dataset.dropna(subset=['IndustryType', 'InformationType'])
+    washington_cube = cubes['washington']
 
-    # Contingency table (raw counts)
-    contingency_raw = pd.crosstab(df_clean['IndustryType'], df_clean['InformationType'])
+    # Contingency table (raw counts; rows missing either value are left out)
+    with stage("aggregate"):
+        contingency = ContingencyTable.from_cube(washington_cube, 'IndustryType', 'InformationType')
 
 
-    # Chi-Square Test - How far the actual distribution of leaked information types across industries deviates from what we would expect if there were no relationship between the two?
-    chi2, p, dof, expected = chi2_contingency(contingency_raw)
-    print(f"Chi-Square Statistic: {chi2:.2f}")
-    print(f"p-value: {p:.12f}")  # extended precision
-
-    # Cramér’s V - How strongly is the type of information leaked associated with the industry sector?
-    n = contingency_raw.to_numpy().sum()
-    min_dim = min(contingency_raw.shape) - 1
-    cramers_v = np.sqrt(chi2 / (n * min_dim)) if min_dim > 0 else np.nan
-    print(f"Cramér’s V: {cramers_v:.4f}")
-
-    # Normalized contingency table
-    contingency_normalized = pd.crosstab(
-        df_clean['IndustryType'],
-        df_clean['InformationType'],
-        normalize='index'
-    )
+    with stage("statistics"):
+        # Chi-Square Test - How far the actual distribution of leaked information types across industries deviates from what we would expect if there were no relationship between the two?
+        # Cramér’s V - How strongly is the type of information leaked associated with the industry sector?
+        print_association(contingency, permutation)
+
+    # Normalized contingency table (from the same counts)
+    contingency_normalized = contingency.row_shares()
 
     # Renaming long labels
     info_type_renames = {
@@ -63,67 +96,50 @@ def main():
 
 
     # Normalized heatmap
-    plt.figure(figsize=(14, 8))
-    sns.heatmap(
-        contingency_normalized,
-        annot=True,
-        fmt=".2f",
-        cmap="BuPu",
-        cbar=False
-    )
-    plt.title(
-        "Share of Leaked Information Types per Industry",
-        fontsize=16,
-        fontweight='bold'
-    )
-    plt.ylabel("Industry Type", fontsize=12, fontweight='bold')
-    plt.xlabel("Information Type", fontsize=12, fontweight='bold')
-    plt.tight_layout()
-    plt.savefig("Hypothesis1/Hypothesis1_Plots/heatmap.png")
-    plt.show()
+    with figure("Hypothesis1/Hypothesis1_Plots/heatmap.png", figsize=(14, 8)):
+        sns.heatmap(
+            contingency_normalized,
+            annot=True,
+            fmt=".2f",
+            cmap="BuPu",
+            cbar=False
+        )
+        plt.title(
+            "Share of Leaked Information Types per Industry",
+            fontsize=16,
+            fontweight='bold'
+        )
+        plt.ylabel("Industry Type", fontsize=12, fontweight='bold')
+        plt.xlabel("Information Type", fontsize=12, fontweight='bold')
+        plt.tight_layout()
 
 
     #GLOBAL DATASET
-    # Load and clean
-    global_dataset = pd.read_csv("data/Kaggle_DB_updated.csv")
-    global_dataset.columns = global_dataset.columns.str.strip()  # remove extra spaces
-    global_clean = global_dataset.dropna(subset=['sector', 'data sensitivity'])
+    global_cube = cubes['kaggle']
 
     # Contingency table (raw counts)
-    contingency_raw_global = pd.crosstab(global_clean['data sensitivity'], global_clean['sector'])
-
-    # Chi-Square test
-    chi2, p, dof, expected = chi2_contingency(contingency_raw_global)
-    print(f"Chi-Square Statistic: {chi2:.2f}")
-    print(f"p-value: {p:.12f}")
+    with stage("aggregate"):
+        contingency_global = ContingencyTable.from_cube(global_cube, 'data sensitivity', 'sector')
 
-    # Cramér’s V
-    n = contingency_raw_global.to_numpy().sum()
-    min_dim = min(contingency_raw_global.shape) - 1
-    cramers_v = np.sqrt(chi2 / (n * min_dim)) if min_dim > 0 else np.nan
-    print(f"Cramér’s V: {cramers_v:.4f}")
+    with stage("statistics"):
+        # Chi-Square test and Cramér’s V
+        print_association(contingency_global, permutation)
 
     # Normalized heatmap
-    contingency_normalized = pd.crosstab(
-        global_clean['data sensitivity'],
-        global_clean['sector'],
-        normalize='index'
-    )
-
-    plt.figure(figsize=(14, 8))
-    sns.heatmap(
-        contingency_normalized,
-        annot=True,
-        fmt=".2f",
-        cmap="BuPu",
-        cbar=False  # Removes colorbar
-    )
-    plt.title("Share of Sector Distribution per Data Sensitivity Level", fontsize=16, fontweight='bold')
-    plt.ylabel("Data Sensitivity", fontsize=12, fontweight='bold')
-    plt.xlabel("Sector", fontsize=12, fontweight='bold')
-    plt.tight_layout()
-    plt.savefig("Hypothesis1/Hypothesis1_Plots/heatmap_global_flipped.png")
-    plt.show()
+    contingency_normalized = contingency_global.row_shares()
+
+    with figure("Hypothesis1/Hypothesis1_Plots/heatmap_global_flipped.png", figsize=(14, 8)):
+        sns.heatmap(
+            contingency_normalized,
+            annot=True,
+            fmt=".2f",
+            cmap="BuPu",
+            cbar=False  # Removes colorbar
+        )
+        plt.title("Share of Sector Distribution per Data Sensitivity Level", fontsize=16, fontweight='bold')
+        plt.ylabel("Data Sensitivity", fontsize=12, fontweight='bold')
+        plt.xlabel("Sector", fontsize=12, fontweight='bold')
+        plt.tight_layout()
 
     colorblind_palette = [
         "#4477AA",  # blue
@@ -143,31 +159,26 @@ def main():
         5.0: "Full Details"
     }
 
+    # One independent render task per sensitivity level, holding only that level's shares (run in parallel)
+    tasks = []
     for (sensitivity_level, row), color in zip(contingency_normalized.iterrows(), colorblind_palette):
-        plt.figure(figsize=(10, 4))
-        (row * 100).plot(
-            kind='bar',
-            color=color,
-            edgecolor='black'
-        )
-
-        info_type = info_type_titles.get(sensitivity_level, "")
-
-        plt.title(
-            f"Sector Distribution for Data Sensitivity Level {sensitivity_level} - {info_type}",
-            fontsize=14, fontweight='bold'
-        )
-        plt.xlabel("Sector", fontsize=12, fontweight='bold')
-        plt.ylabel("Percentage (%)", fontsize=12, fontweight='bold')
-        plt.ylim(0, 100)
-        plt.grid(axis='y', linestyle='--', alpha=0.7)
-        plt.tight_layout()
-        plt.xticks(fontsize=10.5, fontweight='bold')
-
         # Make filename safe
         safe_name = str(sensitivity_level).replace(".", "_")
-        plt.savefig(f"Hypothesis1/Hypothesis1_Plots/barplot_sensitivity_{safe_name}.png")
-        plt.show()
+        info_type = info_type_titles.get(sensitivity_level, "")
+
+        tasks.append(RenderTask(
+            f"Hypothesis1/Hypothesis1_Plots/barplot_sensitivity_{safe_name}.png",
+            plot_sensitivity_shares,
+            {"percentages": row * 100, "color": color,
+             "title": f"Sector Distribution for Data Sensitivity Level {sensitivity_level} - {info_type}"},
+            figsize=(10, 4),
+        ))
+    render_all(tasks)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Hypothesis 1: data breaches by industry and information type.")
+    parser.add_argument("--permutation", action="store_true",
+                        help=f"add a permutation chi-square test (up to {PERMUTATIONS} permutations) to the asymptotic one")
+    parser.add_argument("--streaming", action="store_true", help="read the datasets in chunks instead of loading them")
+    args = parser.parse_args()
+    main(permutation=args.permutation, streaming=args.streaming)
\ No newline at end of file
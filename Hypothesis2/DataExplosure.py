@@ -4,14 +4,21 @@
 # It includes visualizations and statistical tests to understand the impact of data breaches across different sectors.
 # ---------------------------------------------------------
 
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import re
+from data.streaming import load_cubes
+from plotting.rendering import figure
+from instrumentation.stages import stage
 
-def main():
-    # Load the Washington dataset
-    df1 = pd.read_csv('data/Washington_DB.csv')
-    df2 = pd.read_csv('data/Kaggle_DB_updated.csv')
+def main(streaming=False):
+    # Load the aggregate cubes of both datasets (row counts per category); streaming folds them from chunks
+    with stage("load"):
+        cubes = load_cubes(['washington', 'kaggle'], streaming)
+        washington_cube, kaggle_cube = cubes['washington'], cubes['kaggle']
 
 
     # ----- PART 1 - WASHINGTON DATASET -----
@@ -26,20 +33,16 @@ def main():
         "Full Date of Birth": "Date of Birth",
         "Social Security Number": "SSN",
     }
-    df1['InformationType'] = df1['InformationType'].replace(info_type_renames)
-
     # Optional: rename industry values too (not used in this plot, but can be useful later)
     industry_renames = {
         'Non-Profit/Charity': 'Non-Profit'
     }
-    df1['IndustryType'] = df1['IndustryType'].replace(industry_renames)
-
-    # Drop missing values in InformationType column
-    df1_clean = df1.dropna(subset=['InformationType'])
 
-    # Count frequency of each InformationType
-    info_counts = df1_clean['InformationType'].value_counts().reset_index()
-    info_counts.columns = ['InformationType', 'Count']
+    # Count frequency of each InformationType (renamed per category; missing values are left out)
+    with stage("aggregate"):
+        info_counts = washington_cube.counts('InformationType', labels=lambda info: info_type_renames.get(info, info))
+        info_counts = info_counts.reset_index()
+        info_counts.columns = ['InformationType', 'Count']
 
     # Keep only the top 10 most frequent information types
     top10_info_counts = info_counts.head(10)
@@ -48,20 +51,17 @@ def main():
     highlight = ['Name', 'Date of Birth', 'SSN'] # just an example
     colors = ['crimson' if info in highlight else 'gray' for info in top10_info_counts['InformationType']]
 
-    plt.figure(figsize=(10, 6))
-    sns.barplot(data=top10_info_counts, y='InformationType', x='Count', palette=colors)
+    with figure("Hypothesis2/Hypothesis2_Plots/Test_H2_Data_type_exposure_counts.png", figsize=(10, 6)):
+        sns.barplot(data=top10_info_counts, y='InformationType', x='Count', palette=colors)
 
-    plt.title('Top 10 Most Exposed Information Types', fontsize=20)
-    plt.xlabel('Number of Breaches')
-    plt.ylabel('Information Type')
-    plt.tight_layout()
-    plt.savefig("Hypothesis2/Hypothesis2_Plots/Test_H2_Data_type_exposure_counts.png")
-    plt.show()
+        plt.title('Top 10 Most Exposed Information Types', fontsize=20)
+        plt.xlabel('Number of Breaches')
+        plt.ylabel('Information Type')
+        plt.tight_layout()
 
     # ----- PART 2 - WORDLWIDE DATASET -----
 
     # Clean and map 'data sensitivity' column
-    df2 = df2.dropna(subset=['data sensitivity'])
     sensitivity_map = {
         "1": "Email / Online Info",
         "2": "SSN / Personal",
@@ -69,34 +69,27 @@ def main():
         "4": "Health / Personal",
         "5": "Full Details"
     }
-    df2['data sensitivity'] = (
-        df2['data sensitivity']
-        .astype(str)
-        .str.extract(r'(\d)')[0]
-        .map(sensitivity_map)
-    )
+    def sensitivity_name(level):
+        digit = re.search(r'(\d)', str(level))
+        return sensitivity_map.get(digit.group(1)) if digit else None
 
-    # Drop rows where mapping failed
-    df2 = df2.dropna(subset=['data sensitivity'])
-
-    # Count frequency of each data sensitivity type
-    sensitivity_counts = df2['data sensitivity'].value_counts().reset_index()
-    sensitivity_counts.columns = ['DataType', 'Count']
+    # Count frequency of each data sensitivity type (levels that cannot be mapped are left out)
+    with stage("aggregate"):
+        sensitivity_counts = kaggle_cube.counts('data sensitivity', labels=sensitivity_name).reset_index()
+        sensitivity_counts.columns = ['DataType', 'Count']
 
     # Optional: highlight certain types
     highlight = ['SSN / Personal', 'Email / Online Info','Credit Card']
     colors = ['crimson' if dtype in highlight else 'gray' for dtype in sensitivity_counts['DataType']]
 
     # Plot
-    plt.figure(figsize=(10, 6))
-    sns.barplot(data=sensitivity_counts, y='DataType', x='Count', palette=colors)
-
-    plt.title('Frequency of Leaked Data Types (Kaggle Dataset)', fontsize=20)
-    plt.xlabel('Number of Breaches')
-    plt.ylabel('Data Type')
-    plt.tight_layout()
-    plt.savefig("Hypothesis2/Hypothesis2_Plots/Test_H2_Kaggle_Data_type_exposure_counts.png")
-    plt.show()
+    with figure("Hypothesis2/Hypothesis2_Plots/Test_H2_Kaggle_Data_type_exposure_counts.png", figsize=(10, 6)):
+        sns.barplot(data=sensitivity_counts, y='DataType', x='Count', palette=colors)
+
+        plt.title('Frequency of Leaked Data Types (Kaggle Dataset)', fontsize=20)
+        plt.xlabel('Number of Breaches')
+        plt.ylabel('Data Type')
+        plt.tight_layout()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
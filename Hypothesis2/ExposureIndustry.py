@@ -4,17 +4,47 @@
 # It includes visualizations and statistical tests to understand the impact of data breaches across different sectors.
 # ---------------------------------------------------------     
 
-import pandas as pd
 import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('TkAgg')
 import os
+import sys
 import math
+import re
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data.streaming import load_cubes
+from plotting.rendering import figure
+from plotting.fanout import RenderTask, render_all
+from instrumentation.stages import stage
+
+def plot_top5(labels, affected, color, industry_display):
+    """Top 5 data types of one industry by people affected (one render task of Part 1)."""
+    bars = plt.bar(labels, affected, color=color)
+    plt.title(f"{industry_display} in Washington", fontsize=16)
+    plt.xlabel("Data Type", fontsize=12)
+    plt.ylabel("Affected", fontsize=12)
+    plt.ylim(0, affected.max() * 1.15)
+    plt.xticks(rotation=45)
+
+    for bar in bars:
+        height = bar.get_height()
+        if height > 0:
+            digits = int(math.floor(math.log10(height))) + 1
+            factor = 10 ** (digits - 3)
+            rounded = int(round(height / factor)) * factor
+            formatted = f"{rounded:,}".replace(",", " ")
+            plt.annotate(formatted,
+                        xy=(bar.get_x() + bar.get_width() / 2, height),
+                        xytext=(0, -6),
+                        textcoords='offset points',
+                        ha='center', va='top',
+                        fontsize=9, color='white')
 
-def main():
-    # Load data
-    df = pd.read_csv("data/Washington_DB.csv")
-    kaggle_df = pd.read_csv('data/Kaggle_DB_updated.csv')
+    plt.tight_layout()
+
+def main(streaming=False):
+    # Load data (aggregate cubes; streaming folds them from chunks of the datasets)
+    with stage("load"):
+        cubes = load_cubes(['exposures', 'kaggle'], streaming)
+        exposures, kaggle_cube = cubes['exposures'], cubes['kaggle']
 
     # Rename dictionaries (used only for display)
     info_type_renames = {
@@ -31,11 +61,12 @@ def main():
         'Non-Profit/Charity': 'Non-Profit'
     }
 
-    # Clean data
-    df_clean = df.dropna(subset=['IndustryType', 'InformationType', 'WashingtoniansAffected'])
-
-    # Group data
-    grouped = df_clean.groupby(['IndustryType', 'InformationType'])['WashingtoniansAffected'].sum().reset_index()
+    # Group data: people affected per industry and exposed data type (each breach counted once per type)
+    with stage("aggregate"):
+        grouped = (
+            exposures.total(['IndustryType', 'InformationType'], 'WashingtoniansAffected')
+            .reset_index()
+        )
     industries_sorted = sorted(grouped['IndustryType'].unique())
 
     # Use a colorblind-safe palette
@@ -57,49 +88,36 @@ def main():
     rows = math.ceil(num_industries / cols)
 
 
+    # One independent render task per industry, holding only that industry's top 5 (run in parallel)
+    tasks = []
     for industry in industries_sorted:
         industry_display = industry_renames.get(industry, industry)
         industry_data = grouped[grouped['IndustryType'] == industry]
         top5 = industry_data.sort_values(by='WashingtoniansAffected', ascending=False).head(5)
         labels = [info_type_renames.get(info, info) for info in top5['InformationType']]
 
-        plt.figure(figsize=(10, 6))
-        bars = plt.bar(labels, top5['WashingtoniansAffected'], color=bar_colors[industry])
-        plt.title(f"{industry_display} in Washington", fontsize=16)
-        plt.xlabel("Data Type", fontsize=12)
-        plt.ylabel("Affected", fontsize=12)
-        plt.ylim(0, top5['WashingtoniansAffected'].max() * 1.15)
-        plt.xticks(rotation=45)
-
-        for bar in bars:
-            height = bar.get_height()
-            if height > 0:
-                digits = int(math.floor(math.log10(height))) + 1
-                factor = 10 ** (digits - 3)
-                rounded = int(round(height / factor)) * factor
-                formatted = f"{rounded:,}".replace(",", " ")
-                plt.annotate(formatted,
-                            xy=(bar.get_x() + bar.get_width() / 2, height),
-                            xytext=(0, -6),
-                            textcoords='offset points',
-                            ha='center', va='top',
-                            fontsize=9, color='white')
-
-        plt.tight_layout()
-        # Save each plot separately
-        plt.savefig(f"Hypothesis2/Hypothesis2_Plots/H2_{industry_display.replace(' ', '_')}_Top5_WA.png", bbox_inches='tight')
-        plt.show()
+        tasks.append(RenderTask(
+            f"Hypothesis2/Hypothesis2_Plots/H2_{industry_display.replace(' ', '_')}_Top5_WA.png",
+            plot_top5,
+            {"labels": labels, "affected": top5['WashingtoniansAffected'].to_numpy(),
+             "color": bar_colors[industry], "industry_display": industry_display},
+            figsize=(10, 6), bbox_inches='tight',
+        ))
+    render_all(tasks)
 
 
     # --- Part 2: Standardized Top 10 by Industry in Washington (MODIFIED AXIS & COLORS) ---
     # Total per data type
-    total_by_info = df_clean.groupby('InformationType')['WashingtoniansAffected'].sum().sort_values(ascending=False)
-    top10_info_types = total_by_info.head(10).index.tolist()
-    filtered = df_clean[df_clean['InformationType'].isin(top10_info_types)]
+    with stage("aggregate"):
+        total_by_info = exposures.total('InformationType', 'WashingtoniansAffected').sort_values(ascending=False)
+        top10_info_types = total_by_info.head(10).index.tolist()
 
-    # Group and pivot: now pivot so sector is index
-    grouped_top10 = filtered.groupby(['IndustryType', 'InformationType'])['WashingtoniansAffected'].sum().unstack(fill_value=0)
-    grouped_percent = grouped_top10.div(grouped_top10.sum(axis=1), axis=0) * 100
+        # Slice the cube to the top 10 types and pivot so sector is index
+        grouped_top10 = exposures.slice({'InformationType': top10_info_types}).table(
+            'IndustryType', 'InformationType', 'WashingtoniansAffected_sum'
+        )
+        grouped_top10.columns = grouped_top10.columns.astype(str)
+        grouped_percent = grouped_top10.div(grouped_top10.sum(axis=1), axis=0) * 100
 
     # Restrict to sectors that reported top 10 types
     grouped_percent = grouped_percent.loc[industries_sorted]
@@ -114,36 +132,19 @@ def main():
     color_list = [info_colors[info] for info in info_type_list]
 
     # Plot
-    grouped_percent.plot(kind='bar', stacked=True, figsize=(12, 8), color=color_list)
-
-    plt.title("Standardized % of Top 10 Data Types by Industry (Washington)", fontsize=16)
-    plt.xlabel("Industry Type")
-    plt.ylabel("Percentage by Data Type")
-    plt.xticks(rotation=45, ha='right')
-    plt.legend(title='Data Type', bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    plt.savefig("Hypothesis2/Hypothesis2_Plots/H2_Standardized_Washington_Modified.png")
-    plt.show()
+    with figure("Hypothesis2/Hypothesis2_Plots/H2_Standardized_Washington_Modified.png", figsize=(12, 8)) as fig:
+        grouped_percent.plot(kind='bar', stacked=True, color=color_list, ax=fig.gca())
+
+        plt.title("Standardized % of Top 10 Data Types by Industry (Washington)", fontsize=16)
+        plt.xlabel("Industry Type")
+        plt.ylabel("Percentage by Data Type")
+        plt.xticks(rotation=45, ha='right')
+        plt.legend(title='Data Type', bbox_to_anchor=(1.05, 1), loc='upper left')
+        plt.tight_layout()
 
 
     ## ------ PART 3 & 4 DATASET ------
 
-    # Load second dataset (skip first row if it’s notes)
-    df2_raw = pd.read_csv("data/Kaggle_DB_updated.csv")
-
-    # Drop rows with missing necessary fields
-    df2_clean = df2_raw.dropna(subset=['sector', 'data sensitivity', 'records lost']).copy()
-
-    # Clean and convert 'records lost' to numeric
-    df2_clean.loc[:, 'records lost'] = (
-        df2_clean['records lost']
-        .astype(str)
-        .str.replace(",", "", regex=False)
-        .str.extract(r'(\d+)')[0]
-    )
-    df2_clean.loc[:, 'records lost'] = pd.to_numeric(df2_clean['records lost'], errors='coerce')
-    df2_clean = df2_clean.dropna(subset=['records lost'])
-
     # Map sensitivity to readable names
     sensitivity_map = {
         "1": "Email / Online Info (1.0)",
@@ -153,19 +154,18 @@ def main():
         "5": "Full Details (5.0)"
     }
 
-    mapped = (
-        df2_clean['data sensitivity']
-        .astype(str)
-        .str.extract(r'(\d)')[0]
-        .map(sensitivity_map)
-    )
-
-    # Explicitly cast to object dtype before assigning back
-    df2_clean.loc[:, 'data sensitivity'] = mapped.astype(object)
+    def sensitivity_name(level):
+        digit = re.search(r'(\d)', str(level))
+        return sensitivity_map.get(digit.group(1)) if digit else None
 
+    with stage("clean"):
+        # Cells with a sector, a sensitivity and at least one known 'records lost' value
+        cells = kaggle_cube.rollup('sector', 'data sensitivity')
+        cells = cells[cells['records lost_count'] > 0]
 
-    # Drop rows where mapping failed
-    df2_clean = df2_clean.dropna(subset=['data sensitivity'])
+        # The numeric sensitivity becomes a label (mapped per cell); cells where mapping failed are dropped
+        cells = cells.assign(label=cells.index.get_level_values('data sensitivity').map(sensitivity_name))
+        cells = cells.dropna(subset=['label'])
 
     # Color palette (Paul Tol safe palette)
     tol_colors = [
@@ -178,17 +178,24 @@ def main():
         "#BBBBBB"   # gray
     ]
 
-    sectors = sorted(df2_clean['sector'].unique())
+    sectors = sorted(cells.index.get_level_values('sector').unique())
     sector_colors = {sector: tol_colors[i % len(tol_colors)] for i, sector in enumerate(sectors)}
 
     # Group data by sector and data sensitivity
-    grouped = df2_clean.groupby(['sector', 'data sensitivity'])['records lost'].sum().reset_index()
+    with stage("aggregate"):
+        grouped = (
+            cells.groupby([cells.index.get_level_values('sector'), 'label'], observed=True)['records lost_sum'].sum()
+            .rename_axis(['sector', 'data sensitivity'])
+            .rename('records lost')
+            .reset_index()
+        )
 
     # --- PART 4: Standardized % by Sector (MODIFIED AXIS & COLORS) ---
 
-    pivot_table = grouped.pivot(index='sector', columns='data sensitivity', values='records lost').fillna(0)
-    pivot_table = pivot_table.infer_objects()
-    pivot_percent = pivot_table.div(pivot_table.sum(axis=1), axis=0) * 100
+    with stage("aggregate"):
+        pivot_table = grouped.pivot(index='sector', columns='data sensitivity', values='records lost').fillna(0)
+        pivot_table = pivot_table.infer_objects()
+        pivot_percent = pivot_table.div(pivot_table.sum(axis=1), axis=0) * 100
 
     # Ensure consistent column order based on sensitivity_map values
     info_order = list(sensitivity_map.values())
@@ -199,16 +206,15 @@ def main():
     color_list = [info_colors[info] for info in info_order]
 
     # Plot
-    pivot_percent.plot(kind='bar', stacked=True, figsize=(12, 8), color=color_list)
-
-    plt.title("Leaked Data Types by Sector (Standardized %, Worldwide)", fontsize=16)
-    plt.xlabel("Sector")
-    plt.ylabel("% by Data Type")
-    plt.xticks(rotation=45, ha='right')
-    plt.legend(title='Data Type', bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-    plt.savefig("Hypothesis2/Hypothesis2_Plots/H2_Standardized_Worldwide_Modified.png")
-    plt.show()
+    with figure("Hypothesis2/Hypothesis2_Plots/H2_Standardized_Worldwide_Modified.png", figsize=(12, 8)) as fig:
+        pivot_percent.plot(kind='bar', stacked=True, color=color_list, ax=fig.gca())
+
+        plt.title("Leaked Data Types by Sector (Standardized %, Worldwide)", fontsize=16)
+        plt.xlabel("Sector")
+        plt.ylabel("% by Data Type")
+        plt.xticks(rotation=45, ha='right')
+        plt.legend(title='Data Type', bbox_to_anchor=(1.05, 1), loc='upper left')
+        plt.tight_layout()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
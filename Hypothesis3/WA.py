@@ -4,81 +4,110 @@
 # It includes visualizations and statistical tests to understand the impact of data breaches across different sectors.
 # ---------------------------------------------------------
 
-import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy.stats import kruskal, mannwhitneyu, f_oneway, ttest_ind  
-from statsmodels.stats.multitest import multipletests
-from itertools import combinations
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data.breaches import load_breach_index
+from data.cube import load_cube
+from data.streaming import stream_cubes
+from stats.pairwise import anova_from_moments, welch_from_moments
+from stats.nonparametric import nonparametric_tests
+from stats.bootstrap import bootstrap_groups
+from stats.quantiles import GroupedBoxSketch, group_box_stats
+from plotting.rendering import figure
+from plotting.boxplot import draw_boxplot
+from instrumentation.stages import stage
+
+def main(nonparametric=True, streaming=False):
+    # Read data: one row per breach (the raw file repeats each breach once per exposed InformationType).
+    # Streaming folds the cube and the box statistics from chunks of the file instead of keeping the rows.
+    with stage("load"):
+        if streaming:
+            box_sketch = GroupedBoxSketch('IndustryType', 'WashingtoniansAffected')
+            breaches_cube = stream_cubes(['breaches'], partials={'breaches': [box_sketch]})['breaches']
+            df = None
+        else:
+            breaches_cube = load_cube('breaches')
+            df = load_breach_index().breaches
 
-def main():
-    # Read data
-    df = pd.read_csv("data/Washington_DB.csv")
-
-    # Overview of the dataset
-    print("Summary statistics:\n", df.describe(include='all'))
+    with stage("aggregate"):
+        # Overview of the dataset (needs the rows)
+        if not streaming:
+            print("Summary statistics:\n", df.describe(include='all'))
 
 
-    # Sum total breaches per IndustryType
-    total_breaches_by_industry = df['IndustryType'].value_counts().sort_values(ascending=False)
+        # Sum total breaches per IndustryType
+        total_breaches_by_industry = breaches_cube.counts('IndustryType')
     print("total breaches per IndustryType: \n", total_breaches_by_industry)
 
     # Bar plot of total breaches per IndustryType
-    plt.figure(figsize=(8, 6))
-    total_breaches_by_industry.plot(kind='bar', color='steelblue')
-    plt.title("Total Number of Breaches per Sector - Local Dataset")
-    plt.xlabel("Sector")
-    plt.ylabel("Number of Breaches")
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    plt.savefig("Hypothesis3/Hypothesis3_Plots/breach_bar_plot.png")
-    plt.show()
+    with figure("Hypothesis3/Hypothesis3_Plots/breach_bar_plot.png", figsize=(8, 6)):
+        total_breaches_by_industry.plot(kind='bar', color='steelblue')
+        plt.title("Total Number of Breaches per Sector - Local Dataset")
+        plt.xlabel("Sector")
+        plt.ylabel("Number of Breaches")
+        plt.xticks(rotation=45, ha='right')
+        plt.tight_layout()
 
 
     # Total number of people affected per IndustryType
-    total_affected_by_industry = df.groupby('IndustryType')['WashingtoniansAffected'].sum().sort_values(ascending=False)
+    with stage("aggregate"):
+        total_affected_by_industry = breaches_cube.total('IndustryType', 'WashingtoniansAffected').sort_values(ascending=False)
     print("people affected per IndustryType: \n", total_affected_by_industry)
 
     # Bar plot of total people affected per IndustryType
-    plt.figure(figsize=(8, 6))
-    total_affected_by_industry.plot(kind='bar', color='crimson')
-    plt.title("Total Number of People Affected per Sector - Local Dataset")
-    plt.xlabel("Sector")
-    plt.ylabel("Number of People Affected")
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    plt.savefig("Hypothesis3/Hypothesis3_Plots/total_affected_bar_plot.png")
-    plt.show()
+    with figure("Hypothesis3/Hypothesis3_Plots/total_affected_bar_plot.png", figsize=(8, 6)):
+        total_affected_by_industry.plot(kind='bar', color='crimson')
+        plt.title("Total Number of People Affected per Sector - Local Dataset")
+        plt.xlabel("Sector")
+        plt.ylabel("Number of People Affected")
+        plt.xticks(rotation=45, ha='right')
+        plt.tight_layout()
+
 
+    # Per-industry count, mean and variance of people affected (for the plot order and the tests below)
+    with stage("aggregate"):
+        moments = breaches_cube.moments('IndustryType', 'WashingtoniansAffected')
 
     # Boxplot: WashingtoniansAffected by IndustryType (with log scale and mean overlay)
-    order = df.groupby('IndustryType')['WashingtoniansAffected'].mean().sort_values(ascending=False).index
-
-    plt.figure(figsize=(8, 6))
-    sns.boxplot(
-        x='IndustryType',
-        y='WashingtoniansAffected',
-        data=df,
-        color='skyblue',
-        showmeans=True,
-        meanprops={"marker": "o", "markerfacecolor": "red", "markeredgecolor": "black"},
-        order=order  # <-- Sort x-axis by mean
-    )
-    plt.yscale('log')  # Set y-axis to log scale
-    plt.title("People Affected per Breach by Sector - Local Dataset")
-    plt.xlabel("Sector")
-    plt.ylabel("Number of People Affected per Breach (log scale)")
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    plt.savefig("Hypothesis3/Hypothesis3_Plots/waff_boxplot_log.png")
-    plt.show()
+    order = moments['mean'].sort_values(ascending=False).index
+
+    # Quartiles, whiskers, means and outliers per IndustryType (instead of the raw values)
+    with stage("aggregate"):
+        if streaming:
+            boxes = box_sketch.stats(order)  # <-- Sort x-axis by mean
+        else:
+            boxes = group_box_stats(df, 'IndustryType', 'WashingtoniansAffected', order=order)
+
+    with figure("Hypothesis3/Hypothesis3_Plots/waff_boxplot_log.png", figsize=(8, 6)):
+        draw_boxplot(
+            boxes,
+            color='skyblue',
+            showmeans=True,
+            meanprops={"marker": "o", "markerfacecolor": "red", "markeredgecolor": "black"},
+        )
+        plt.yscale('log')  # Set y-axis to log scale
+        plt.title("People Affected per Breach by Sector - Local Dataset")
+        plt.xlabel("Sector")
+        plt.ylabel("Number of People Affected per Breach (log scale)")
+        plt.xticks(rotation=45, ha='right')
+        plt.tight_layout()
+
+
+    # Bootstrap confidence intervals for the mean, median and total people affected per IndustryType
+    if streaming:
+        print("\nBootstrap intervals skipped: resampling needs every breach in memory.")
+    else:
+        with stage("statistics"):
+            intervals = bootstrap_groups(df, 'IndustryType', 'WashingtoniansAffected')
+        print("\nBootstrap 95% confidence intervals of people affected (percentile and BCa):")
+        print(intervals.to_string(float_format=lambda value: f"{value:,.0f}"))
 
 
     # One-way ANOVA test to check for overall significance
-    groups = [df.loc[df['IndustryType'] == ind, 'WashingtoniansAffected'].dropna() for ind in df['IndustryType'].unique()]
-    f_stat, p_anova = f_oneway(*groups)
+    with stage("statistics"):
+        f_stat, p_anova = anova_from_moments(moments)
     print(f"\nOne-way ANOVA: F = {f_stat:.4f}, p = {p_anova:.4g}")
     if p_anova < 0.05:
         print("Result: Significant differences exist between at least some IndustryTypes.")
@@ -86,26 +115,25 @@ def main():
         print("Result: No significant difference between IndustryTypes.")
 
 
-    # Pairwise t-tests with Bonferroni correction
-    industry_types = df['IndustryType'].unique()
-    pairs = list(combinations(industry_types, 2))
-    ttest_pvals = []
-
-    for a, b in pairs:
-        group_a = df.loc[df['IndustryType'] == a, 'WashingtoniansAffected'].dropna()
-        group_b = df.loc[df['IndustryType'] == b, 'WashingtoniansAffected'].dropna()
-        if len(group_a) > 1 and len(group_b) > 1:
-            stat, p = ttest_ind(group_a, group_b, equal_var=False)
-            ttest_pvals.append(p)
-        else:
-            ttest_pvals.append(np.nan)
-
-    # Bonferroni correction
-    reject, pvals_bonf, _, _ = multipletests(ttest_pvals, method='bonferroni')
+    # Pairwise Welch t-tests with Bonferroni correction (all pairs from the group moments above)
+    with stage("statistics"):
+        welch = welch_from_moments(moments, method='bonferroni')
 
     print("\nPairwise t-test results (Bonferroni corrected):")
-    for idx, (a, b) in enumerate(pairs):
-        print(f"{a} vs {b}: p = {pvals_bonf[idx]:.4g} {'*' if reject[idx] else ''}")
+    for a, b, p, reject in welch.pairs():
+        print(f"{a} vs {b}: p = {p:.4g} {'*' if reject else ''}")
+
+    # Rank-based tests (Kruskal-Wallis + pairwise Mann-Whitney U), better suited to the heavily skewed people affected
+    if nonparametric and streaming:
+        print("\nRank-based tests skipped: ranking needs every breach in memory.")
+    elif nonparametric:
+        with stage("statistics"):
+            h_stat, p_kruskal, mann_whitney = nonparametric_tests(df, 'IndustryType', 'WashingtoniansAffected', method='bonferroni')
+        print(f"\nKruskal-Wallis: H = {h_stat:.4f}, p = {p_kruskal:.4g}")
+
+        print("\nPairwise Mann-Whitney U results (Bonferroni corrected):")
+        for a, b, p, reject in mann_whitney.pairs():
+            print(f"{a} vs {b}: p = {p:.4g} {'*' if reject else ''}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -4,103 +4,125 @@
 # It includes visualizations and statistical tests to understand the impact of data breaches across different sectors.
 # ---------------------------------------------------------  
 
-import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy.stats import kruskal, mannwhitneyu, ttest_ind, f_oneway
-from statsmodels.stats.multitest import multipletests
-from itertools import combinations
-
-def main():
-    df = pd.read_csv("data/Kaggle_DB_updated.csv")
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data.loader import load_kaggle
+from data.normalization import normalize
+from data.cube import load_cube
+from data.streaming import stream_cubes
+from stats.pairwise import anova_from_moments, welch_from_moments
+from stats.nonparametric import nonparametric_tests
+from stats.bootstrap import bootstrap_groups
+from stats.quantiles import GroupedBoxSketch, group_box_stats
+from plotting.rendering import figure
+from plotting.boxplot import draw_boxplot
+from instrumentation.stages import stage
+
+def main(nonparametric=True, streaming=False):
+    with stage("load"):
+        if streaming:
+            # Fold the cube and the box statistics from chunks of the file instead of keeping the rows
+            box_sketch = GroupedBoxSketch('sector', 'records lost')
+            cube = stream_cubes(['kaggle'], partials={'kaggle': [box_sketch]})['kaggle']
+        else:
+            df = load_kaggle()
+            # Aggregates per (sector, data sensitivity, method) cell, with the same sector rules as below
+            cube = load_cube('kaggle')
 
-    # Replace all exact matches of 'financial' with 'finance' in the 'sector' column
-    df['sector'] = df['sector'].replace('financial', 'finance')
-    df['sector'] = df['sector'].astype(str).apply(lambda x: 'government' if 'government' in x else x)
-    df['sector'] = df['sector'].astype(str).apply(lambda x: 'military' if 'military' in x else x)
-    df['sector'] = df['sector'].astype(str).apply(lambda x: 'misc' if 'misc' in x else x)
-    df['sector'] = df['sector'].astype(str).apply(lambda x: 'tech' if 'tech' in x else x)
-    df['sector'] = df['sector'].astype(str).apply(lambda x: 'web' if 'web' in x else x)
+    if streaming:
+        # The rows are never held in memory, so the overview comes from the cube
+        print("Number of rows:", int(cube.rollup()['rows'].iloc[0]))
+    else:
+        with stage("clean"):
+            # Same sector rules as data/Datasets_Cleaning.py (a no-op on already cleaned data)
+            df['sector'], dropped = normalize(df['sector'])
+            df = df[~dropped]
 
-    print(df)
+        print(df)
 
-    # Overview of the dataset
-    print("Number of rows:", df.shape[0])
-    print("Number of columns:", df.shape[1])
+        # Overview of the dataset
+        print("Number of rows:", df.shape[0])
+        print("Number of columns:", df.shape[1])
 
-    print("Column names:")
-    print(df.columns.tolist())
+        print("Column names:")
+        print(df.columns.tolist())
 
-    print("Data types of each column:")
-    print(df.dtypes)
+        print("Data types of each column:")
+        print(df.dtypes)
 
-    print("Summary statistics:")
-    print(df.describe(include='all'))
+        print("Summary statistics:")
+        with stage("aggregate"):
+            print(df.describe(include='all'))
 
-    # Sum total breaches per sector
-    total_breaches_by_sector = df['sector'].value_counts().sort_values(ascending=False)
+    with stage("aggregate"):
+        # Sum total breaches per sector
+        total_breaches_by_sector = cube.counts('sector')
     print("Total breaches per sector: \n", total_breaches_by_sector)
 
     # Bar plot of total breaches per sector
-    plt.figure(figsize=(8, 6))
-    total_breaches_by_sector.plot(kind='bar', color='steelblue')
-    plt.title("Total Number of Breaches per Sector - Global Dataset")
-    plt.xlabel("Sector")
-    plt.ylabel("Number of Breaches")
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    plt.savefig("Hypothesis3/Hypothesis3_Plots/breach_bar_plot.png")
-    plt.show()
-
-    # Convert 'records lost' to numeric (remove commas if present), set errors='coerce' to handle non-numeric values
-    df['records_lost_numeric'] = pd.to_numeric(df['records lost'].astype(str).str.replace(',', ''), errors='coerce')
+    with figure("Hypothesis3/Hypothesis3_Plots/breach_bar_plot_global.png", figsize=(8, 6)):
+        total_breaches_by_sector.plot(kind='bar', color='steelblue')
+        plt.title("Total Number of Breaches per Sector - Global Dataset")
+        plt.xlabel("Sector")
+        plt.ylabel("Number of Breaches")
+        plt.xticks(rotation=45, ha='right')
+        plt.tight_layout()
 
     # Sum of records lost per sector
-    record_lost_by_sector = df.groupby('sector')['records_lost_numeric'].sum().sort_values(ascending=False)
+    with stage("aggregate"):
+        record_lost_by_sector = cube.total('sector', 'records lost').sort_values(ascending=False)
     print("Record lost by sector: \n", record_lost_by_sector)
 
     # Bar plot of total records lost per sector
-    plt.figure(figsize=(8, 6))
-    record_lost_by_sector.plot(kind='bar', color='crimson')
-    plt.title("Total Records Lost per Sector - Global Dataset")
-    plt.xlabel("Sector")
-    plt.ylabel("Number of Records Lost")
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    plt.savefig("Hypothesis3/Hypothesis3_Plots/record_lost_by_sector.png")
-    plt.show()
+    with figure("Hypothesis3/Hypothesis3_Plots/record_lost_by_sector.png", figsize=(8, 6)):
+        record_lost_by_sector.plot(kind='bar', color='crimson')
+        plt.title("Total Records Lost per Sector - Global Dataset")
+        plt.xlabel("Sector")
+        plt.ylabel("Number of Records Lost")
+        plt.xticks(rotation=45, ha='right')
+        plt.tight_layout()
 
 
     # Boxplot: Records Lost per Breach by Sector (log scale, mean overlay)
-    plt.figure(figsize=(8, 6))
-    sns.boxplot(
-        x='sector',
-        y='records_lost_numeric',
-        data=df,
-        color='skyblue',
-        showmeans=True,
-        meanprops={"marker": "o", "markerfacecolor": "red", "markeredgecolor": "black"}
-    )
-    plt.yscale('log')  # Set y-axis to log scale
-    plt.title("Records Lost per Breach by Sector - Global Dataset")
-    plt.xlabel("Sector")
-    plt.ylabel("Number of Records Lost per Breach (log scale)")
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-
-    plt.savefig("Hypothesis3/Hypothesis3_Plots/records_lost_per_breach_boxplot_log.png")
-    plt.show()# Calculate mean and standard error for records lost per sector
-    mean_records_by_sector = df.groupby('sector')['records_lost_numeric'].agg(['mean', 'count', 'std'])
-    mean_records_by_sector['se'] = mean_records_by_sector['std'] / np.sqrt(mean_records_by_sector['count'])
-    print(mean_records_by_sector)
-
-    # Prepare the data for ANOVA: a list of arrays, one for each sector
-    sector_types = df['sector'].unique()
-    anova_groups = [df.loc[df['sector'] == sector, 'records_lost_numeric'].dropna() for sector in sector_types]
+    with stage("aggregate"):
+        if streaming:
+            boxes = box_sketch.stats()  # order of appearance
+        else:
+            boxes = group_box_stats(df, 'sector', 'records lost')  # order of appearance
+
+    with figure("Hypothesis3/Hypothesis3_Plots/records_lost_per_breach_boxplot_log.png", figsize=(8, 6)):
+        draw_boxplot(
+            boxes,
+            color='skyblue',
+            showmeans=True,
+            meanprops={"marker": "o", "markerfacecolor": "red", "markeredgecolor": "black"}
+        )
+        plt.yscale('log')  # Set y-axis to log scale
+        plt.title("Records Lost per Breach by Sector - Global Dataset")
+        plt.xlabel("Sector")
+        plt.ylabel("Number of Records Lost per Breach (log scale)")
+        plt.xticks(rotation=45, ha='right')
+        plt.tight_layout()
+
+    # Bootstrap confidence intervals for the mean, median and total records lost per sector
+    # (breach sizes are heavy-tailed, so mean ± standard error would be misleading)
+    if streaming:
+        print("\nBootstrap intervals skipped: resampling needs every breach in memory.")
+    else:
+        with stage("statistics"):
+            intervals = bootstrap_groups(df, 'sector', 'records lost')
+        print("\nBootstrap 95% confidence intervals of records lost (percentile and BCa):")
+        print(intervals.to_string(float_format=lambda value: f"{value:,.0f}"))
+
+    # Prepare the data for ANOVA: count, mean and variance per sector, rolled up from the cube
+    with stage("aggregate"):
+        moments = cube.moments('sector', 'records lost')
 
     # Perform one-way ANOVA
-    anova_stat, anova_p = f_oneway(*anova_groups)
+    with stage("statistics"):
+        anova_stat, anova_p = anova_from_moments(moments)
     print(f"\nOne-way ANOVA result: F = {anova_stat:.4f}, p = {anova_p:.4g}")
 
     if anova_p < 0.05:
@@ -110,25 +132,24 @@ def main():
 
 
     # multiple t-tests (independent samples, Welch’s t-test) with Bonferroni correction
-    sector_types = df['sector'].unique()
-    pairs = list(combinations(sector_types, 2))
-    ttest_pvals = []
-
-    for a, b in pairs:
-        group_a = df.loc[df['sector'] == a, 'records_lost_numeric'].dropna()
-        group_b = df.loc[df['sector'] == b, 'records_lost_numeric'].dropna()
-        if len(group_a) > 1 and len(group_b) > 1:
-            stat, p = ttest_ind(group_a, group_b, equal_var=False)
-            ttest_pvals.append(p)
-        else:
-            ttest_pvals.append(np.nan)
-
-    # Bonferroni correction
-    reject, pvals_bonf, _, _ = multipletests(ttest_pvals, method='bonferroni')
+    with stage("statistics"):
+        welch = welch_from_moments(moments, method='bonferroni')
 
     print("\nPairwise t-test results (Bonferroni corrected):")
-    for idx, (a, b) in enumerate(pairs):
-        print(f"{a} vs {b}: p = {pvals_bonf[idx]:.4g} {'*' if reject[idx] else ''}")
+    for a, b, p, reject in welch.pairs():
+        print(f"{a} vs {b}: p = {p:.4g} {'*' if reject else ''}")
+
+    # Rank-based tests (Kruskal-Wallis + pairwise Mann-Whitney U), better suited to the heavily skewed records lost
+    if nonparametric and streaming:
+        print("\nRank-based tests skipped: ranking needs every breach in memory.")
+    elif nonparametric:
+        with stage("statistics"):
+            h_stat, p_kruskal, mann_whitney = nonparametric_tests(df, 'sector', 'records lost', method='bonferroni')
+        print(f"\nKruskal-Wallis: H = {h_stat:.4f}, p = {p_kruskal:.4g}")
+
+        print("\nPairwise Mann-Whitney U results (Bonferroni corrected):")
+        for a, b, p, reject in mann_whitney.pairs():
+            print(f"{a} vs {b}: p = {p:.4g} {'*' if reject else ''}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,78 +2,168 @@
 # Decision Tree Classifier for Data Breach Methods
 # --------------------------------------------------------
 
+import argparse
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, GridSearchCV
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401 (enables HalvingRandomSearchCV)
+from sklearn.model_selection import train_test_split, GridSearchCV, RandomizedSearchCV, HalvingRandomSearchCV
 from sklearn.tree import DecisionTreeClassifier, plot_tree, export_graphviz, _tree
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
-from sklearn.model_selection import cross_val_score
 import matplotlib.pyplot as plt
 import seaborn as sns
 from graphviz import Digraph
 import re
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data.loader import load_kaggle
+from data.categorical import relabel
+from Hypothesis4.model_cache import artifact_key, load_artifact, save_artifact
+from plotting.rendering import figure, record_output
+from instrumentation.stages import stage
+
+# Hyperparameter search: 'grid' (exhaustive), 'random' (randomized) or 'halving' (successive halving)
+SEARCH_MODES = ('grid', 'random', 'halving')
+SEARCH_MODE = 'grid'
+# Upper bound on the number of model fits for the 'random' and 'halving' modes
+FIT_BUDGET = 600
+CV_FOLDS = 5
+
+# Parameter grid searched over (exhaustively in 'grid' mode, sampled otherwise)
+PARAM_GRID = {
+    'max_depth': list(range(2, 11)),
+    'min_samples_split': list(range(2, 11)),
+    'min_samples_leaf': list(range(1, 5)),
+    'criterion': ['gini', 'entropy'],
+}
+
+
+def make_search(estimator, param_grid, mode=SEARCH_MODE, fit_budget=FIT_BUDGET, cv=CV_FOLDS, random_state=42):
+    """Build the hyperparameter search for `estimator` over `param_grid`.
+
+    'grid' tries every combination. 'random' samples fit_budget // cv combinations. 'halving' starts
+    with enough random candidates to spend about fit_budget fits and keeps the best third on three
+    times as many samples in each round (every round costs at most as many fits as the one before).
+    """
+    common = dict(cv=cv, scoring='accuracy', n_jobs=-1)
+    grid_size = int(np.prod([len(values) for values in param_grid.values()]))
+    if mode == 'grid':
+        return GridSearchCV(estimator, param_grid, **common)
+    if mode == 'random':
+        n_iter = min(grid_size, max(1, fit_budget // cv))
+        return RandomizedSearchCV(estimator, param_grid, n_iter=n_iter, random_state=random_state, **common)
+    if mode == 'halving':
+        # Candidates shrink by a factor of 3 per round: n * (1 + 1/3 + 1/9 + ...) <= 1.5 n candidate fits
+        n_candidates = min(grid_size, max(3, int(fit_budget / (1.5 * cv))))
+        return HalvingRandomSearchCV(estimator, param_grid, n_candidates=n_candidates, factor=3,
+                                     random_state=random_state, **common)
+    raise ValueError(f"Unknown search mode '{mode}' (expected 'grid', 'random' or 'halving')")
+
+
+def best_cv_scores(search):
+    """Per-fold test scores of the best candidate, taken from the search instead of refitting."""
+    return np.array([
+        search.cv_results_[f'split{fold}_test_score'][search.best_index_]
+        for fold in range(search.n_splits_)
+    ])
+
+
+def build_features(df, feature_columns=None):
+    """Model input: log1p(records lost), data sensitivity and the one-hot encoded sector.
+
+    Without `feature_columns` the sector columns are taken from the data (training). With the
+    training layout given (scoring), the one-hot columns are aligned to it and sectors that were not
+    seen during training are encoded as all zeros.
+    """
+    if feature_columns is None:
+        sectors = sorted(df['sector'].unique())
+    else:
+        sectors = [col[len('sector_'):] for col in feature_columns if col.startswith('sector_')]
+    codes = pd.Categorical(df['sector'], categories=sectors).codes
+    X = pd.DataFrame(
+        codes[:, None] == np.arange(len(sectors)),
+        columns=[f'sector_{sector}' for sector in sectors],
+        index=df.index,
+    )
+    # Applying log-encoding to reduce skew
+    X.insert(0, 'records_lost', np.log1p(df['records lost'].to_numpy(dtype=float)))
+    X.insert(1, 'data sensitivity', df['data sensitivity'].to_numpy(dtype=float))
+    return X
 
-def main():
-    # Load your data
-    df = pd.read_csv('data/Kaggle_DB_updated.csv')  # Replace with your actual file path
 
-    # Basic data cleaning
-    df = df.dropna(subset=['records lost', 'sector', 'data sensitivity', 'method'])
-    df['records lost'] = df['records lost'].str.replace(',', '', regex=False).astype(int)
-    df['data sensitivity'] = pd.to_numeric(df['data sensitivity'], errors='coerce')
-    df = df.dropna(subset=['records lost', 'data sensitivity'])
+def rank_classes(probabilities, k=3):
+    """Indices of the k most likely classes, most likely first (the order shown in the tree)."""
+    return np.argsort(probabilities, axis=-1)[..., ::-1][..., :k]
 
-    # Applying log-encoding to reduce skew
-    df['records lost'] = np.log1p(df['records lost'])  # reduce skew
 
-    # Clean up method categories (remove extra spaces and duplicates)
-    df['method'] = df['method'].str.strip()
-    df['method'] = df['method'].replace('poor security ', 'poor security')
-    df['method'] = df['method'].replace('lost device ', 'lost device')
-    df.drop(df[df['method'] == 'hacked'].index, inplace=True)
+def main(search_mode=SEARCH_MODE, fit_budget=FIT_BUDGET):
+    # Load your data
+    with stage("load"):
+        df = load_kaggle(columns=['records lost', 'sector', 'data sensitivity', 'method'])
+
+    with stage("clean"):
+        # Basic data cleaning
+        df = df.dropna(subset=['records lost', 'sector', 'data sensitivity', 'method'])
+
+        # Clean up method categories (remove extra spaces and duplicates)
+        df['method'] = relabel(df['method'], str.strip)
+        df.drop(df[df['method'] == 'hacked'].index, inplace=True)
+        df['method'] = df['method'].cat.remove_unused_categories()
 
     print(f"Dataset shape: {df.shape}")
-    print(f"Unique methods: {df['method'].unique()}")
-    print(f"Unique sectors: {df['sector'].unique()}")
+    print(f"Unique methods: {list(df['method'].unique())}")
+    print(f"Unique sectors: {list(df['sector'].unique())}")
     print(f"Unique data sensitivities: {df['data sensitivity'].unique()}")
 
-    # One-hot encode categorical variables
-    sector_dummies = pd.get_dummies(df['sector'], prefix='sector')
-    le_method = LabelEncoder()
-
-    # Prepare features and target
-    X = pd.concat([
-        df[['records lost', 'data sensitivity']].rename(columns={'records lost': 'records_lost'}),
-        sector_dummies
-    ], axis=1)
-    y = le_method.fit_transform(df['method'])
-    class_labels = le_method.classes_  # list of method names in order of encoding
-
-    # Define parameter grid for GridSearchCV
-    param_grid = {
-        'max_depth': list(range(2, 11)),
-        'min_samples_split': list(range(2, 11)),
-        'min_samples_leaf': list(range(1, 5)),
-        'criterion': ['gini', 'entropy'],
+    # Prepare features (log-scaled records lost, one-hot encoded sector) and target
+    with stage("aggregate"):
+        X = build_features(df)
+        le_method = LabelEncoder()
+        y = le_method.fit_transform(df['method'])
+        class_labels = le_method.classes_  # list of method names in order of encoding
+
+    # Reuse the stored model if neither the data nor the search configuration changed
+    search_config = {
+        'mode': search_mode,
+        'fit_budget': fit_budget,
+        'cv': CV_FOLDS,
+        'param_grid': PARAM_GRID,
+        'random_state': 42,
     }
-
-    # Initialize base model
-    dt = DecisionTreeClassifier(random_state=42)
-
-    # Grid search with 10-fold cross-validation
-    grid_search = GridSearchCV(dt, param_grid, cv=5, scoring='accuracy', n_jobs=-1)
-    grid_search.fit(X, y)
-
-    # Evaluate best estimator with 10-fold CV
-    best_dt = grid_search.best_estimator_
-    cv_scores = cross_val_score(best_dt, X, y, cv=5, scoring='accuracy')
-    print(f"\nBest Parameters: {grid_search.best_params_}")
+    key = artifact_key(X, y, class_labels, search_config)
+    artifact = load_artifact(key)
+
+    if artifact is None:
+        # Initialize base model
+        dt = DecisionTreeClassifier(random_state=42)
+
+        # Hyperparameter search with 5-fold cross-validation
+        search = make_search(dt, PARAM_GRID, mode=search_mode, fit_budget=fit_budget, cv=CV_FOLDS)
+        with stage("fit"):
+            search.fit(X, y)
+        n_fits = len(search.cv_results_['params']) * search.n_splits_
+
+        # The search already refits the best estimator on the full dataset and keeps its CV scores
+        artifact = save_artifact(key, {
+            'model': search.best_estimator_,
+            'classes': list(class_labels),
+            'feature_columns': list(X.columns),
+            'search_config': search_config,
+            'best_params': search.best_params_,
+            'cv_scores': best_cv_scores(search),
+            'cv_results': search.cv_results_,
+            'n_fits': n_fits,
+        })
+        print(f"\nSearch mode: {search_mode} ({n_fits} fits), saved model artifact {key[:16]}")
+    else:
+        print(f"\nSearch mode: {search_mode}, loaded cached model artifact {key[:16]} ({artifact['created']})")
+
+    best_dt = artifact['model']
+    cv_scores = artifact['cv_scores']
+    print(f"\nBest Parameters: {artifact['best_params']}")
     print(f"Cross-validated Accuracy (mean ± std): {cv_scores.mean():.3f} ± {cv_scores.std():.3f}")
 
-    # Fit final model on full dataset
-    best_dt.fit(X, y)
-
     # Sorted by frequency (Seaborn plots use this)
     ordered_methods = df['method'].value_counts().index.tolist()
 
@@ -92,15 +182,6 @@ def main():
         for i, method in enumerate(ordered_methods)
     }
 
-    # Helper: format float nicely
-    def fmt(val):
-        if val >= 1e6:
-            return f"{val / 1e6:.1f}M"
-        elif val >= 1e3:
-            return f"{val / 1e3:.0f}K"
-        else:
-            return f"{val:.0f}"
-
     # Build the Graphviz Digraph
     dot = Digraph()
     dot.attr('node', shape='box', style='filled,rounded', fontname='Helvetica')
@@ -108,17 +189,11 @@ def main():
     tree = best_dt.tree_
     feature_names = X.columns
 
-    # Encode method labels using this fixed order
-    method_to_index = {method: i for i, method in enumerate(ordered_methods)}
-    index_to_method = {i: method for method, i in method_to_index.items()}
-
-    y = df['method'].map(method_to_index)
-    class_labels = ordered_methods  # Same as index_to_method.values()
-
-    # Use consistent class color mapping
+    # Node values are indexed like the model's classes; colors follow the frequency order above
+    class_labels = artifact['classes']
     class_colors = {
         i: method_to_color[method]
-        for i, method in index_to_method.items()
+        for i, method in enumerate(class_labels)
     }
 
     # Label formatting helper
@@ -137,7 +212,7 @@ def main():
         value = tree.value[node_id][0]
 
         # Class probabilities
-        sorted_class_indices = np.argsort(value)[::-1]
+        sorted_class_indices = rank_classes(value, k=len(value))
         top_idx = sorted_class_indices[0]
         second_idx = sorted_class_indices[1] if len(sorted_class_indices) > 1 else None
         third_idx = sorted_class_indices[2] if len(sorted_class_indices) > 2 else None
@@ -178,23 +253,28 @@ def main():
             dot.edge(str(node_id), str(right), label="No")
             add_nodes_edges(dot, right)
 
-    # Start recursive tree build
-    add_nodes_edges(dot)
+    with stage("render"):
+        # Start recursive tree build
+        add_nodes_edges(dot)
 
-    # Save to file
-    dot.format = 'svg'
-    dot.render('./Hypothesis4/Hypothesis4_Plots/final_decision_tree', cleanup=True)
+        # Save to file
+        dot.format = 'svg'
+        record_output(dot.render('./Hypothesis4/Hypothesis4_Plots/final_decision_tree', cleanup=True))
 
     # Feature importance
-    plt.figure(figsize=(12, 6))
-    importances = best_dt.feature_importances_
-    indices = np.argsort(importances)[::-1]
-    plt.bar(range(len(importances)), importances[indices])
-    plt.xticks(range(len(importances)), [X.columns[i] for i in indices], rotation=45)
-    plt.title('Feature Importance (Final Model)')
-    plt.tight_layout()
-    plt.savefig("./Hypothesis4/Hypothesis4_Plots/final_feature_importance.svg")
-    plt.show()
+    with figure("./Hypothesis4/Hypothesis4_Plots/final_feature_importance.svg", figsize=(12, 6)):
+        importances = best_dt.feature_importances_
+        indices = np.argsort(importances)[::-1]
+        plt.bar(range(len(importances)), importances[indices])
+        plt.xticks(range(len(importances)), [X.columns[i] for i in indices], rotation=45)
+        plt.title('Feature Importance (Final Model)')
+        plt.tight_layout()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Hypothesis 4: decision tree classifier for data breach methods.")
+    parser.add_argument("--search", choices=SEARCH_MODES, default=SEARCH_MODE,
+                        help=f"hyperparameter search (default: {SEARCH_MODE}; 'random' and 'halving' are much faster)")
+    parser.add_argument("--fit-budget", type=int, default=FIT_BUDGET,
+                        help=f"upper bound on the model fits of the random/halving search (default: {FIT_BUDGET})")
+    args = parser.parse_args()
+    main(search_mode=args.search, fit_budget=args.fit_budget)
\ No newline at end of file
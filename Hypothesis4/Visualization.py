@@ -2,23 +2,31 @@
 # How do records lost vary by method?
 # -----------------------------------------------------
 
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data.loader import load_kaggle
+from data.categorical import relabel
+from stats.quantiles import group_box_stats
+from plotting.rendering import figure
+from plotting.boxplot import draw_boxplot
+from instrumentation.stages import stage
 
 def main():
     # Load the dataset
-    df = pd.read_csv('data/Kaggle_DB_updated.csv')
+    with stage("load"):
+        df = load_kaggle(columns=['records lost', 'method'])
 
     # Clean and preprocess
-    df = df.dropna(subset=['records lost', 'method'])
-    df['records lost'] = df['records lost'].str.replace(',', '', regex=False).astype(int)
-    df['method'] = df['method'].str.strip()
-    df['method'] = df['method'].replace('poor security ', 'poor security')
-    df['method'] = df['method'].replace('lost device ', 'lost device')
+    with stage("clean"):
+        df = df.dropna(subset=['records lost', 'method'])
+        df['method'] = relabel(df['method'], str.strip)
 
     # Count methods in descending order
-    ordered_methods = df['method'].value_counts().index.tolist()
+    with stage("aggregate"):
+        ordered_methods = df['method'].value_counts().index.tolist()
 
     colorblind_palette = [
         "#4477AA",  # blue
@@ -40,38 +48,31 @@ def main():
     # Separate box-plot for Each Method (using FacetGrid)
     # -----------------------------------------------------
     # Plot box plot of records lost by method
-    plt.figure(figsize=(12, 6))
-    sns.boxplot(
-        data=df,
-        x='method',
-        y='records lost',
-        palette=method_to_color)
-    plt.yscale('log')  # Log scale to handle skew
-    plt.xlabel('Breach Method', fontsize=14)
-    plt.ylabel('Records Lost (log scale)', fontsize=14)
-    plt.title('Distribution of Records Lost by Breach Method', fontsize=16)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
+    with stage("aggregate"):
+        boxes = group_box_stats(df, 'method', 'records lost')  # order of appearance
 
-    # Save the plot
-    plt.savefig("Hypothesis4/Hypothesis4_Plots/records_lost_by_method_boxplot.svg")
-    plt.show()
+    with figure("Hypothesis4/Hypothesis4_Plots/records_lost_by_method_boxplot.svg", figsize=(12, 6)):
+        draw_boxplot(boxes, palette=method_to_color)
+        plt.yscale('log')  # Log scale to handle skew
+        plt.xlabel('Breach Method', fontsize=14)
+        plt.ylabel('Records Lost (log scale)', fontsize=14)
+        plt.title('Distribution of Records Lost by Breach Method', fontsize=16)
+        plt.xticks(rotation=45)
+        plt.tight_layout()
 
     # -----------------------------------------------------
     # Number of Breaches by Method (Count Plot)
     # -----------------------------------------------------
-    plt.figure(figsize=(10, 6))
-    sns.countplot(
-        data=df,
-        y='method',
-        order=ordered_methods,  # maintain order
-        palette=method_to_color)
-    plt.xlabel('Number of Breaches', fontsize=14)
-    plt.ylabel('Breach Method', fontsize=14)
-    plt.title('Number of Breaches by Method', fontsize=16)
-    plt.tight_layout()
-    plt.savefig("Hypothesis4/Hypothesis4_Plots/breach_counts_by_method.svg")
-    plt.show()
+    with figure("Hypothesis4/Hypothesis4_Plots/breach_counts_by_method.svg", figsize=(10, 6)):
+        sns.countplot(
+            data=df,
+            y='method',
+            order=ordered_methods,  # maintain order
+            palette=method_to_color)
+        plt.xlabel('Number of Breaches', fontsize=14)
+        plt.ylabel('Breach Method', fontsize=14)
+        plt.title('Number of Breaches by Method', fontsize=16)
+        plt.tight_layout()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
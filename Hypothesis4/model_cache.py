@@ -0,0 +1,83 @@
+# ---------------------------------------------------------
+# Model Artifact Cache for the Breach-Method Decision Tree
+# Stores the fitted classifier together with everything needed to reuse it (label classes, feature
+# column layout, CV results) as a versioned artifact keyed by a hash of the training data and the
+# search configuration, so unchanged data is never retrained.
+# ---------------------------------------------------------
+
+import datetime
+import hashlib
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Hypothesis4_Models")
+LATEST_POINTER = "latest.txt"
+
+# Directory to keep artifacts in instead of MODEL_DIR (used by the benchmarks, so synthetic
+# models never replace the latest real one)
+MODEL_DIR_ENV = "BREACH_MODEL_DIR"
+
+# Bump whenever the artifact layout or the feature preparation changes
+ARTIFACT_VERSION = 1
+
+
+def artifact_key(X, y, classes, config):
+    """Hash of the feature matrix, the encoded target and the search configuration."""
+    digest = hashlib.sha256()
+    digest.update(f"v{ARTIFACT_VERSION}|sklearn {sklearn.__version__}".encode())
+    digest.update(json.dumps(config, sort_keys=True, default=str).encode())
+    digest.update(json.dumps([str(col) for col in X.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    digest.update(json.dumps([str(c) for c in classes]).encode())
+    return digest.hexdigest()
+
+
+def model_dir():
+    return os.environ.get(MODEL_DIR_ENV) or MODEL_DIR
+
+
+def _artifact_path(key):
+    return os.path.join(model_dir(), f"decision_tree_{key[:16]}.joblib")
+
+
+def load_artifact(key=None):
+    """Artifact stored under `key` (the most recently saved one if None), or None if there is none."""
+    if key is None:
+        try:
+            with open(os.path.join(model_dir(), LATEST_POINTER)) as f:
+                path = os.path.join(model_dir(), f.read().strip())
+        except OSError:
+            return None
+    else:
+        path = _artifact_path(key)
+    try:
+        artifact = joblib.load(path)
+    except (OSError, EOFError, ValueError):
+        return None
+    if artifact.get("version") != ARTIFACT_VERSION or (key is not None and artifact.get("key") != key):
+        return None
+    return artifact
+
+
+def save_artifact(key, artifact):
+    """Store `artifact` (a dict) under `key` and mark it as the latest one."""
+    os.makedirs(model_dir(), exist_ok=True)
+    artifact = dict(
+        artifact,
+        version=ARTIFACT_VERSION,
+        key=key,
+        sklearn_version=sklearn.__version__,
+        created=datetime.datetime.now().isoformat(timespec="seconds"),
+    )
+    path = _artifact_path(key)
+    joblib.dump(artifact, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    with open(os.path.join(model_dir(), LATEST_POINTER), "w") as f:
+        f.write(os.path.basename(path))
+    return artifact
@@ -0,0 +1,144 @@
+# ---------------------------------------------------------
+# Batch Scoring of Breach Methods
+# Streams a CSV or Parquet file of (sector, data sensitivity, records lost) rows through the trained
+# decision tree in chunks and writes the predicted method together with the three most likely
+# methods and their probabilities, ranked like the nodes of the rendered tree.
+#
+# Usage: python Hypothesis4/score.py incidents.csv -o predictions.csv [--chunksize 500000]
+# The model is the latest artifact saved by DecisionTree.py (or --model path/to/artifact.joblib).
+# ---------------------------------------------------------
+
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data.parsing import parse_counts
+from Hypothesis4.DecisionTree import build_features, rank_classes
+from Hypothesis4.model_cache import load_artifact
+
+FEATURE_INPUTS = ['sector', 'data sensitivity', 'records lost']
+TOP_K = 3
+
+
+def _is_parquet(path):
+    return path.lower().endswith(('.parquet', '.pq'))
+
+
+def read_chunks(path, columns, chunksize):
+    """Yield DataFrames of at most `chunksize` rows with only the requested columns."""
+    if _is_parquet(path):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("Reading Parquet input requires pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV or Parquet file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet_writer = None
+        self.first = True
+
+    def write(self, frame):
+        if _is_parquet(self.path):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self.parquet_writer is None:
+                self.parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self.parquet_writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode='w' if self.first else 'a', header=self.first, index=False,
+                         float_format='%.6g')
+        self.first = False
+
+    def close(self):
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+
+
+def score_chunk(chunk, artifact):
+    """Predicted method plus top-3 methods/probabilities for every row of `chunk`.
+
+    A decision tree only produces one distribution per leaf, so the ranking is computed once per
+    distinct leaf and broadcast back to the rows. Rows with a missing or non-numeric feature get
+    empty predictions.
+    """
+    chunk = chunk.copy()
+    if not pd.api.types.is_numeric_dtype(chunk['records lost']):
+        chunk['records lost'] = parse_counts(chunk['records lost'])[0]
+    chunk['data sensitivity'] = pd.to_numeric(chunk['data sensitivity'], errors='coerce')
+    valid = chunk[FEATURE_INPUTS].notna().all(axis=1).to_numpy()
+
+    model = artifact['model']
+    classes = np.asarray(artifact['classes'], dtype=object)
+    k = min(TOP_K, len(classes))
+
+    # Leaf per row -> (distinct leaves, row -> leaf position); -1 marks rows that were not scored
+    leaf_of_row = np.full(len(chunk), -1)
+    leaves = np.empty(0, dtype=int)
+    if valid.any():
+        X = build_features(chunk[valid], feature_columns=artifact['feature_columns'])
+        leaves, leaf_of_row[valid] = np.unique(model.apply(X), return_inverse=True)
+    values = model.tree_.value[leaves, 0, :]
+    proba = values / values.sum(axis=1, keepdims=True)
+    top = rank_classes(proba, k=k)
+
+    # Only scored rows are looked up: with no valid row at all there are no leaves to index
+    rows, row_leaves = np.flatnonzero(leaf_of_row >= 0), leaf_of_row[leaf_of_row >= 0]
+    scored = {}
+    for rank in range(k):
+        codes = np.full(len(chunk), -1)
+        codes[rows] = top[row_leaves, rank]
+        methods = pd.Categorical.from_codes(codes, classes)
+        if rank == 0:
+            scored['predicted_method'] = methods
+        scored[f'method_{rank + 1}'] = methods
+        leaf_proba = np.take_along_axis(proba, top[:, [rank]], axis=1).ravel()
+        probabilities = np.full(len(chunk), np.nan)
+        probabilities[rows] = leaf_proba[row_leaves]
+        scored[f'probability_{rank + 1}'] = probabilities
+    return pd.DataFrame(scored, index=chunk.index)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score breach methods for a CSV/Parquet file of incidents.")
+    parser.add_argument("input", help="CSV or Parquet file with the columns: " + ", ".join(FEATURE_INPUTS))
+    parser.add_argument("-o", "--output", required=True, help="CSV or Parquet file to write the predictions to")
+    parser.add_argument("--model", help="model artifact to use (default: the latest one trained by DecisionTree.py)")
+    parser.add_argument("--chunksize", type=int, default=500_000, help="rows per chunk (default: 500000)")
+    parser.add_argument("--keep", nargs="*", default=[], metavar="COLUMN",
+                        help="input columns to copy into the output (e.g. an incident id)")
+    args = parser.parse_args(argv)
+
+    artifact = joblib.load(args.model) if args.model else load_artifact()
+    if artifact is None:
+        sys.exit("No trained model found - run Hypothesis4/DecisionTree.py first")
+
+    columns = list(dict.fromkeys(args.keep + FEATURE_INPUTS))
+    writer = ChunkWriter(args.output)
+    start, rows = time.perf_counter(), 0
+    try:
+        for chunk in read_chunks(args.input, columns, args.chunksize):
+            scored = score_chunk(chunk, artifact)
+            writer.write(pd.concat([chunk[args.keep], scored], axis=1))
+            rows += len(chunk)
+            print(f"Scored {rows:,} rows ({rows / (time.perf_counter() - start):,.0f} rows/s)", file=sys.stderr)
+    finally:
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# ---------------------------------------------------------
+# Benchmark Suite for the Hypothesis Scripts
+# Runs every hypothesis main() on synthetic datasets at 10x, 100x and 1000x the real size (see
+# synthetic.py) and records the wall time of each stage (load, clean, aggregate, statistics,
+# render, ...) and the peak memory of every run in a JSON file under benchmarks/results/, so a
+# later run can be compared against it to spot regressions between commits.
+#
+# Usage: python benchmarks/run_benchmarks.py [--scales 10,100,1000] [--only H1,H3] [--compare]
+# Each run happens in a fresh process with its own working directory, so plots and models of the
+# synthetic data never overwrite the real ones.
+# ---------------------------------------------------------
+
+import argparse
+import datetime
+import glob
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import ensure_dataset
+from data.loader import DATA_DIR_ENV
+from generate_all_plots import HYPOTHESES, ROOT, select_hypotheses
+from Hypothesis4.model_cache import MODEL_DIR_ENV
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+# A run is reported as a regression when it is this much slower (or bigger) than the baseline
+REGRESSION_RATIO = 1.2
+
+
+def _peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB elsewhere
+
+
+def _exception_line(error):
+    """'ExceptionType: message' line of a formatted traceback (messages may span several lines)."""
+    return [line for line in error.strip().splitlines() if not line.startswith(" ")][-1]
+
+
+def run_worker(key, trace_memory=False):
+    """Run one hypothesis in this process and print its measurements as a JSON line."""
+    import time
+    import tracemalloc
+
+    from generate_all_plots import run_hypothesis
+    from instrumentation.stages import collect, summarize
+
+    if trace_memory:
+        tracemalloc.start()
+    label, module_name, _ = HYPOTHESES[key]
+    start = time.perf_counter()
+    with collect() as records:
+        result = run_hypothesis(label, module_name)
+    print(json.dumps({
+        "seconds": time.perf_counter() - start,
+        "peak_rss_bytes": _peak_rss_bytes(),
+        "stages": summarize(records),
+        "error": _exception_line(result["error"]) if result["error"] else None,
+    }))
+
+
+def run_one(key, data_dir, trace_memory=False, warm=False, timeout=None):
+    """Measure hypothesis `key` on the datasets in `data_dir` in a separate process."""
+    if not warm:
+        shutil.rmtree(os.path.join(data_dir, ".cache"), ignore_errors=True)
+    with tempfile.TemporaryDirectory(prefix="breach-bench-") as workdir:
+        env = dict(os.environ, MPLBACKEND="Agg", **{DATA_DIR_ENV: data_dir, MODEL_DIR_ENV: os.path.join(workdir, "models")})
+        command = [sys.executable, os.path.abspath(__file__), "--worker", key]
+        if trace_memory:
+            command.append("--tracemalloc")
+        try:
+            completed = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {"seconds": None, "peak_rss_bytes": None, "stages": {}, "error": f"timed out after {timeout} s"}
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        error = (completed.stderr.strip().splitlines() or ["no output"])[-1]
+        return {"seconds": None, "peak_rss_bytes": None, "stages": {}, "error": error}
+    return json.loads(lines[-1])
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _environment():
+    import matplotlib
+    import numpy
+    import pandas
+    import sklearn
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "packages": {module.__name__: module.__version__ for module in (numpy, pandas, sklearn, matplotlib)},
+    }
+
+
+def _mb(n_bytes):
+    return f"{n_bytes / 2**20:9.1f}" if n_bytes is not None else f"{'-':>9}"
+
+
+def print_run(run):
+    seconds = f"{run['seconds']:9.2f}" if run["seconds"] is not None else f"{'-':>9}"
+    stages = "  ".join(f"{name} {entry['seconds']:.2f}s" for name, entry in run["stages"].items())
+    print(f"  x{run['scale']:<5} {run['hypothesis']:<20} {seconds} s {_mb(run['peak_rss_bytes'])} MB  {stages}")
+    if run["error"]:
+        print(f"         FAILED: {run['error']}")
+
+
+def compare(results, baseline):
+    """Print the time/memory ratio of every run against the matching run of `baseline`."""
+    previous = {(run["scale"], run["hypothesis"]): run for run in baseline["runs"]}
+    print(f"\nCompared with {baseline.get('commit') or '?'} ({baseline['created']}):")
+    for run in results["runs"]:
+        old = previous.get((run["scale"], run["hypothesis"]))
+        if old is None or not run["seconds"] or not old["seconds"]:
+            continue
+        notes = []
+        for field, name in (("seconds", "time"), ("peak_rss_bytes", "memory")):
+            if run[field] and old[field]:
+                ratio = run[field] / old[field]
+                flag = "  REGRESSION" if ratio > REGRESSION_RATIO else ""
+                notes.append(f"{name} x{ratio:.2f}{flag}")
+        print(f"  x{run['scale']:<5} {run['hypothesis']:<20} " + ", ".join(notes))
+
+
+def latest_results(exclude=None):
+    paths = sorted(path for path in glob.glob(os.path.join(RESULTS_DIR, "*.json")) if path != exclude)
+    return paths[-1] if paths else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the hypothesis scripts on scaled-up synthetic data.")
+    parser.add_argument("--scales", default="10,100,1000",
+                        help="comma-separated scale factors (1 = the real data, default: 10,100,1000)")
+    parser.add_argument("--only", metavar="KEYS", help="hypotheses to benchmark, as in generate_all_plots.py")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic data (default: 0)")
+    parser.add_argument("--warm", action="store_true",
+                        help="keep the loaders' disk cache between runs (default: every run parses the CSVs)")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="also record the Python heap peak per stage (slows the runs down)")
+    parser.add_argument("--timeout", type=float, help="seconds after which a single run is aborted")
+    parser.add_argument("-o", "--output", help="results file (default: benchmarks/results/<date>_<commit>.json)")
+    parser.add_argument("--compare", nargs="?", const="latest", metavar="RESULTS",
+                        help="compare with a previous results file (default: the most recent one)")
+    parser.add_argument("--worker", metavar="KEY", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, trace_memory=args.tracemalloc)
+        return 0
+    try:
+        keys = select_hypotheses(args.only)
+        scales = [int(scale) for scale in args.scales.split(",")]
+    except ValueError as e:
+        parser.error(str(e))
+
+    commit = _git_commit()
+    created = datetime.datetime.now().isoformat(timespec="seconds")
+    output = args.output or os.path.join(RESULTS_DIR, f"{created.replace(':', '')}_{commit or 'unknown'}.json")
+    baseline_path = latest_results(exclude=output) if args.compare == "latest" else args.compare
+
+    results = dict(created=created, commit=commit, seed=args.seed, warm=args.warm, **_environment(), runs=[])
+    for scale in scales:
+        print(f"Preparing x{scale} datasets...")
+        data_dir = ensure_dataset(scale, seed=args.seed)
+        for key in keys:
+            run = run_one(key, data_dir, trace_memory=args.tracemalloc, warm=args.warm, timeout=args.timeout)
+            run = dict(scale=scale, hypothesis=key, **run)
+            results["runs"].append(run)
+            print_run(run)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {os.path.relpath(output)}")
+
+    if args.compare:
+        if baseline_path is None:
+            print("No previous results to compare with.")
+        else:
+            with open(baseline_path) as f:
+                compare(results, json.load(f))
+    return 1 if any(run["error"] for run in results["runs"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# ---------------------------------------------------------
+# Synthetic Breach Datasets for Benchmarking
+# Builds scaled-up copies of the Washington and Kaggle CSVs with the exact raw schema and formats.
+# Every scale step adds a new "population" of organisations resampled (with replacement) from the
+# real breaches: the joint distribution of sectors, information types, methods and dates is kept,
+# the heavy-tailed counts (WashingtoniansAffected, records lost) are jittered multiplicatively and
+# ids/names are made unique per population, so cardinalities grow the way a bigger registry would.
+# ---------------------------------------------------------
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data.loader import DATA_DIR, KAGGLE_CSV, WASHINGTON_CSV
+
+SYNTHETIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Bump whenever the generated data changes so existing synthetic datasets are regenerated
+GENERATOR_VERSION = 1
+# Spread (sigma of the log-normal factor) of the jitter applied to the people/records counts
+JITTER_SIGMA = 0.3
+# Rows written per to_csv call
+CHUNK_ROWS = 250_000
+
+
+def _read_raw(path):
+    # Everything as text, so untouched columns are written back byte-for-byte
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+def _jitter(values, factors, fmt):
+    """Multiply the numeric strings in `values` by `factors`; non-numeric entries are kept."""
+    numbers = pd.to_numeric(values.str.replace(",", "", regex=False), errors="coerce").to_numpy()
+    scaled = np.maximum(np.round(numbers * factors), 1)
+    return pd.Series(np.where(np.isnan(numbers), values.to_numpy(), [fmt.format(x) for x in scaled]),
+                     index=values.index)
+
+
+def _suffix(names, population):
+    """Organisation names of populations > 0 get a ' #<population>' suffix."""
+    suffixed = names + " #" + pd.Series(population, index=names.index).astype(str)
+    return names.where(population == 0, suffixed)
+
+
+def _washington_chunks(raw, scale, rng):
+    # The file is long format (one row per breach and information type): resample whole breaches
+    raw = raw.assign(_id=pd.to_numeric(raw["Id"])).sort_values("_id", kind="stable")
+    _, starts, lengths = np.unique(raw["_id"].to_numpy(), return_index=True, return_counts=True)
+    raw = raw.drop(columns="_id").reset_index(drop=True)
+    n_breaches = len(starts)
+
+    copies = max(1, CHUNK_ROWS // len(raw))
+    for first in range(0, scale, copies):
+        m = min(copies, scale - first)
+        picked = rng.integers(0, n_breaches, size=m * n_breaches)
+        sizes = lengths[picked]
+        # Row positions of every picked breach: its start plus 0..size-1
+        offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        chunk = raw.iloc[np.repeat(starts[picked], sizes) + offsets].reset_index(drop=True)
+
+        breach = np.repeat(np.arange(first * n_breaches, (first + m) * n_breaches), sizes)
+        chunk["Id"] = (breach + 1).astype(str)
+        chunk["Name"] = _suffix(chunk["Name"], breach // n_breaches)
+        factors = rng.lognormal(0.0, JITTER_SIGMA, size=m * n_breaches)
+        chunk["WashingtoniansAffected"] = _jitter(chunk["WashingtoniansAffected"], np.repeat(factors, sizes), "{:.1f}")
+        yield chunk
+
+
+def _kaggle_chunks(raw, scale, rng):
+    copies = max(1, CHUNK_ROWS // len(raw))
+    for first in range(0, scale, copies):
+        m = min(copies, scale - first)
+        chunk = raw.iloc[rng.integers(0, len(raw), size=m * len(raw))].reset_index(drop=True)
+
+        row = np.arange(first * len(raw), (first + m) * len(raw))
+        chunk["ID"] = [f"{i}.0" for i in row + 1]
+        chunk["organisation"] = _suffix(chunk["organisation"], row // len(raw))
+        factors = rng.lognormal(0.0, JITTER_SIGMA, size=len(chunk))
+        chunk["records lost"] = _jitter(chunk["records lost"], factors, "{:,.0f}")
+        yield chunk
+
+
+def _write_chunks(chunks, path):
+    with open(path + ".tmp", "w", newline="", encoding="utf-8") as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, header=i == 0, index=False)
+    os.replace(path + ".tmp", path)
+
+
+def generate(scale, out_dir, seed=0):
+    """Write both datasets at `scale` times their real size into `out_dir` (same file names as data/)."""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng([seed, scale])
+    _write_chunks(_washington_chunks(_read_raw(WASHINGTON_CSV), scale, rng),
+                  os.path.join(out_dir, os.path.basename(WASHINGTON_CSV)))
+    _write_chunks(_kaggle_chunks(_read_raw(KAGGLE_CSV), scale, rng),
+                  os.path.join(out_dir, os.path.basename(KAGGLE_CSV)))
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump({"scale": scale, "seed": seed, "version": GENERATOR_VERSION}, f)
+
+
+def ensure_dataset(scale, seed=0, root=SYNTHETIC_DIR):
+    """Directory holding the datasets at `scale` (1 = the real data), generated on first use."""
+    if scale == 1:
+        return DATA_DIR
+    out_dir = os.path.join(root, f"x{scale}")
+    try:
+        with open(os.path.join(out_dir, "meta.json")) as f:
+            if json.load(f) == {"scale": scale, "seed": seed, "version": GENERATOR_VERSION}:
+                return out_dir
+    except (OSError, ValueError):
+        pass
+    generate(scale, out_dir, seed=seed)
+    return out_dir
@@ -2,36 +2,143 @@
 # Data Cleaning Script for Kaggle and Washington State Data Breaches
 # This script cleans and processes data from Kaggle and Washington State datasets,
 # focusing on standardizing sector names and removing unwanted entries.
+# The raw CSVs are never modified: cleaned rows go to separate artifacts (Kaggle_DB_updated.csv,
+# Washington_DB_cleaned.csv) and a watermark file remembers the highest ID already cleaned, so a
+# rerun only cleans and appends the rows added to the feed since. A change of the cleaning rules,
+# of the raw header or of the artifact itself triggers a full rebuild.
 # ---------------------------------------------------------
 
+import argparse
+import hashlib
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import pandas as pd
-df = pd.read_csv("Kaggle_DB.csv")
-df = df.drop(index=0)
+
+from data.loader import KAGGLE_CSV, WASHINGTON_CLEAN_CSV, WASHINGTON_CSV, data_dir
+from data.normalization import normalize, SECTOR_RULES
+
+KAGGLE_RAW_CSV = "Kaggle_DB.csv"
+WATERMARK_FILE = ".cleaning_watermark.json"
+CHUNK_ROWS = 50_000
+
+# Industries outside the scope of the local analysis
+EXCLUDED_INDUSTRIES = ['Non-Profit/Charity']
 
 
 ## GLOBAL
-# Replace all exact matches of 'financial' with 'finance' in the 'sector' column
-df['sector'] = df['sector'].replace('financial', 'Finance')
-df['sector'] = df['sector'].replace('finance', 'Finance')
-df['sector'] = df['sector'].replace('academic', 'Education')
-df['sector'] = df['sector'].astype(str).apply(lambda x: 'Government' if 'government' in x else x)
-df['sector'] = df['sector'].astype(str).apply(lambda x: 'military' if 'military' in x else x)
-df['sector'] = df['sector'].astype(str).apply(lambda x: 'other' if 'misc' in x else x)
-df = df[~df['sector'].astype(str).str.contains('legal')]
-df = df[~df['sector'].astype(str).str.contains('NGO')]
-
-# Define sectors to merge into "business"
-business_keywords = ['app', 'gaming', 'retail', 'tech', 'telecoms', 'transport', 'web']
-
-# Convert anything containing any business keyword into "business"
-df['sector'] = df['sector'].astype(str).apply(
-    lambda x: 'Business' if any(keyword in x for keyword in business_keywords) else x
-)
-df = df[~df['sector'].isin(['military', 'other'])]
-df.loc[df['sector'].str.strip().str.lower() == 'health', 'sector'] = 'Health'
-df.to_csv("Kaggle_DB_updated.csv", index=False)
+def clean_kaggle(df):
+    """Standardize sector names with the shared rule table and drop the sectors it excludes."""
+    sector, dropped = normalize(df['sector'], SECTOR_RULES)
+    df = df[~dropped].copy()
+    df['sector'] = sector[~dropped]
+    return df
+
 
 ## LOCAL
-df = pd.read_csv("Washington_DB.csv")
-df = df[df['IndustryType'] != 'Non-Profit/Charity']
-df.to_csv("Washington_DB.csv", index=False)
\ No newline at end of file
+def clean_washington(df):
+    """Drop the excluded industries."""
+    return df[~df['IndustryType'].isin(EXCLUDED_INDUSTRIES)]
+
+
+# Dataset -> (raw CSV, cleaned CSV, ID column, cleaning function, rules the result depends on)
+PIPELINES = {
+    "kaggle": (KAGGLE_RAW_CSV, os.path.basename(KAGGLE_CSV), "ID", clean_kaggle, SECTOR_RULES),
+    "washington": (os.path.basename(WASHINGTON_CSV), os.path.basename(WASHINGTON_CLEAN_CSV), "Id",
+                   clean_washington, EXCLUDED_INDUSTRIES),
+}
+
+
+def load_watermarks(directory):
+    try:
+        with open(os.path.join(directory, WATERMARK_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_watermarks(watermarks, directory):
+    path = os.path.join(directory, WATERMARK_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(watermarks, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def clean_dataset(name, watermarks, directory, full=False):
+    """Clean the rows of dataset `name` above its watermark; returns (rows written, rebuilt?).
+
+    Raw values are passed through as text, so untouched columns keep their exact formatting.
+    Rows without a numeric ID (e.g. the description row of the Kaggle sheet) are not records.
+    """
+    raw, cleaned, id_column, clean, rules = PIPELINES[name]
+    raw_path, out_path = os.path.join(directory, raw), os.path.join(directory, cleaned)
+    rules_hash = hashlib.sha256(json.dumps(rules).encode()).hexdigest()
+    columns = pd.read_csv(raw_path, nrows=0).columns.tolist()
+
+    entry = None if full else watermarks.get(name)
+    incremental = (
+        entry is not None
+        and entry["rules"] == rules_hash
+        and entry["columns"] == columns
+        and os.path.exists(out_path)
+        and os.path.getsize(out_path) == entry["size"]
+    )
+    watermark = entry["max_id"] if incremental and entry["max_id"] is not None else float("-inf")
+    max_id, written = watermark, 0
+
+    # Full rebuilds go to a temporary file that replaces the artifact at the end
+    target = out_path if incremental else out_path + ".tmp"
+    f = None if incremental else open(target, "w", newline="", encoding="utf-8")
+    if f is not None:
+        pd.DataFrame(columns=columns).to_csv(f, index=False)
+    try:
+        for chunk in pd.read_csv(raw_path, dtype=str, keep_default_na=False, chunksize=CHUNK_ROWS):
+            ids = pd.to_numeric(chunk[id_column], errors="coerce")
+            new = ids > watermark
+            if not new.any():
+                continue
+            max_id = max(max_id, ids[new].max())
+            rows = clean(chunk[new])
+            if f is None:
+                f = open(target, "a", newline="", encoding="utf-8")
+            rows.to_csv(f, index=False, header=False)
+            written += len(rows)
+    finally:
+        if f is not None:
+            f.close()
+    if not incremental:
+        os.replace(target, out_path)
+
+    watermarks[name] = {
+        "rules": rules_hash,
+        "columns": columns,
+        "max_id": None if max_id == float("-inf") else float(max_id),
+        "rows": (entry["rows"] if incremental else 0) + written,
+        "size": os.path.getsize(out_path),
+    }
+    return written, not incremental
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean the raw breach datasets into their cleaned artifacts.")
+    parser.add_argument("--full", action="store_true", help="ignore the watermarks and rebuild the artifacts")
+    parser.add_argument("--only", choices=sorted(PIPELINES), action="append",
+                        help="dataset to clean (repeatable; default: all)")
+    args = parser.parse_args(argv)
+
+    directory = data_dir()
+    watermarks = load_watermarks(directory)
+    for name in args.only or PIPELINES:
+        written, rebuilt = clean_dataset(name, watermarks, directory, full=args.full)
+        # Save after every dataset, so an interrupted run keeps the progress made so far
+        save_watermarks(watermarks, directory)
+        entry = watermarks[name]
+        action = "rebuilt" if rebuilt else "appended"
+        print(f"{name}: {action} {written} rows -> {PIPELINES[name][1]} "
+              f"({entry['rows']} rows, max {PIPELINES[name][2]} {entry['max_id']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# ---------------------------------------------------------
+# Breach-Level Index for the Washington State Dataset
+# The Washington file is in long format: one row per (breach Id, InformationType). This module
+# normalizes it into a breach table keyed by Id plus a sparse breach x information-type incidence
+# matrix, so per-breach statistics are not inflated by the number of exposed information types.
+# ---------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from data.loader import dataset_path, load_washington
+from instrumentation.stages import traced
+
+
+class BreachIndex:
+    """Breach table (one row per Id) plus the set of information types exposed by each breach.
+
+    Attributes:
+        breaches: DataFrame indexed by Id with every breach-level column of the dataset.
+        information_types: Index of the distinct information types (incidence columns).
+        breach_codes, info_codes: int-coded (breach row, information type) pairs, without duplicates.
+    """
+
+    def __init__(self, df):
+        self.breaches = (
+            df.drop(columns="InformationType")
+            .drop_duplicates(subset="Id")
+            .set_index("Id")
+            .sort_index()
+        )
+
+        exposed = df.dropna(subset=["InformationType"])
+        info_codes, self.information_types = pd.factorize(exposed["InformationType"], sort=True)
+        breach_codes = self.breaches.index.get_indexer(exposed["Id"])
+
+        # Building the matrix sums duplicate (breach, type) rows, so nonzero() yields each pair once
+        matrix = sparse.coo_matrix(
+            (np.ones(len(breach_codes), dtype=np.int32), (breach_codes, info_codes)),
+            shape=(len(self.breaches), len(self.information_types)),
+        ).tocsr()
+        self.breach_codes, self.info_codes = matrix.nonzero()
+
+    @property
+    def incidence(self):
+        """Sparse boolean (breach x information type) matrix."""
+        return sparse.csr_matrix(
+            (np.ones(len(self.breach_codes), dtype=bool), (self.breach_codes, self.info_codes)),
+            shape=(len(self.breaches), len(self.information_types)),
+        )
+
+    def count_by(self, column):
+        """Number of distinct breaches per value of a breach-level column, largest first."""
+        return self.breaches[column].value_counts()
+
+    def affected_by(self, column):
+        """Total WashingtoniansAffected per value of a breach-level column (each breach counted once)."""
+        return self.breaches.groupby(column)["WashingtoniansAffected"].sum()
+
+    def by_information_type(self, column):
+        """Breaches and people affected per (column value, information type) pair.
+
+        Computed in a single bincount over the incidence pairs. Returns a long DataFrame with one
+        row per observed pair and the columns [column, 'InformationType', 'Breaches',
+        'WashingtoniansAffected'].
+        """
+        group_codes, groups = pd.factorize(self.breaches[column], sort=True)
+        affected = self.breaches["WashingtoniansAffected"].fillna(0).to_numpy()
+
+        pair_group = group_codes[self.breach_codes]
+        valid = pair_group >= 0  # breaches with a missing group value are left out
+        n_types = len(self.information_types)
+        keys = pair_group[valid] * n_types + self.info_codes[valid]
+        size = len(groups) * n_types
+
+        breaches = np.bincount(keys, minlength=size)
+        people = np.bincount(keys, weights=affected[self.breach_codes[valid]], minlength=size)
+
+        observed = np.flatnonzero(breaches)
+        return pd.DataFrame({
+            column: groups[observed // n_types],
+            "InformationType": self.information_types[observed % n_types],
+            "Breaches": breaches[observed],
+            "WashingtoniansAffected": people[observed],
+        })
+
+
+# In-process memo (source path -> index), built from the memoized loader frame
+_index = {}
+
+
+@traced()
+def load_breach_index():
+    """Memoized BreachIndex of the Washington dataset. Treat it as read-only."""
+    source = dataset_path("washington")
+    if source not in _index:
+        _index[source] = BreachIndex(load_washington())
+    return _index[source]
@@ -0,0 +1,31 @@
+# ---------------------------------------------------------
+# Category-Level Relabelling
+# The loader returns the breach dimensions (IndustryType, sector, method, ...) as pandas categoricals.
+# Display renames and clean-ups only have to look at the distinct categories, after which the rows
+# are re-pointed with one integer take over their codes, instead of rewriting every string.
+# ---------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+
+def relabel(series, mapping):
+    """Categorical copy of `series` with every category renamed by `mapping` (dict or callable).
+
+    Categories that end up with the same label are merged, categories no row uses are dropped and
+    the remaining ones are sorted, like the categories the loader produces. Labels missing from a
+    dict mapping are kept as they are.
+    """
+    series = series.astype("category")
+    categories = series.cat.categories
+    rename = mapping if callable(mapping) else (lambda label: mapping.get(label, label))
+    labels = pd.Index([rename(label) for label in categories])
+
+    codes = series.cat.codes.to_numpy()
+    used = np.bincount(codes[codes >= 0], minlength=len(categories)) > 0
+    new_categories = labels[used].unique().sort_values()
+    recode = np.append(new_categories.get_indexer(labels), -1)  # code -1 (missing) stays -1
+    return pd.Series(
+        pd.Categorical.from_codes(recode[codes], categories=new_categories),
+        index=series.index, name=series.name,
+    )
@@ -0,0 +1,106 @@
+# ---------------------------------------------------------
+# Columnar On-Disk Store for the Cleaned Datasets
+# Each cleaned dataset is kept as one .npy file per column, described by an explicit dtype schema:
+# numbers, booleans and datetimes are stored as plain arrays, nullable integers as values + mask, and
+# text and categoricals as int32 codes into a JSON list of distinct values (categoricals are read
+# back without building a single string per row). Columns are memory-mapped on read, so a script
+# that needs two columns never touches (or parses) the wide text fields of the others.
+# ---------------------------------------------------------
+
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+# Storage kinds of the schema, besides plain NumPy dtypes ("int64", "float64", "bool", "datetime64[us]")
+TEXT = "str"
+CATEGORY = "category"
+NULLABLE_INT = "Int64"
+
+
+def apply_schema(df, schema):
+    """Cast `df` to `schema` ({column: dtype}) and order its columns like the schema."""
+    missing = [column for column in schema if column not in df.columns]
+    if missing:
+        raise ValueError(f"columns missing from the dataset: {missing}")
+    return df[list(schema)].astype(schema)
+
+
+def _column_files(directory, position):
+    base = os.path.join(directory, f"{position:03d}")
+    return base + ".npy", base + ".mask.npy", base + ".values.json"
+
+
+def write_store(directory, df, schema, meta):
+    """Write `df` (already in `schema`) plus `meta` into `directory`, replacing it atomically."""
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    staging = os.path.join(parent, f".{os.path.basename(directory)}.{uuid.uuid4().hex}")
+    os.makedirs(staging)
+    for position, (column, dtype) in enumerate(schema.items()):
+        data_path, mask_path, values_path = _column_files(staging, position)
+        series = df[column]
+        if dtype in (TEXT, CATEGORY):
+            if dtype == CATEGORY:
+                codes, values = series.cat.codes.to_numpy(), series.cat.categories
+            else:
+                codes, values = pd.factorize(series)
+            np.save(data_path, codes.astype(np.int32))
+            with open(values_path, "w", encoding="utf-8") as f:
+                json.dump([str(value) for value in values], f)
+        elif dtype == NULLABLE_INT:
+            np.save(data_path, series.to_numpy(dtype=np.int64, na_value=0))
+            np.save(mask_path, series.isna().to_numpy())
+        else:
+            np.save(data_path, series.to_numpy(dtype=dtype))
+    with open(os.path.join(staging, "meta.json"), "w") as f:
+        json.dump(dict(meta, rows=len(df), schema=schema), f)
+
+    # A directory cannot be renamed over a non-empty one: move the old store aside first
+    retired = staging + ".old"
+    if os.path.exists(directory):
+        os.replace(directory, retired)
+    os.replace(staging, directory)
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def read_meta(directory):
+    """Metadata of the store in `directory`, or None if there is no readable store."""
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _read_column(directory, position, dtype):
+    data_path, mask_path, values_path = _column_files(directory, position)
+    data = np.load(data_path, mmap_mode="r")
+    if dtype == CATEGORY:
+        with open(values_path, encoding="utf-8") as f:
+            return pd.Categorical.from_codes(np.array(data), categories=json.load(f))
+    if dtype == TEXT:
+        with open(values_path, encoding="utf-8") as f:
+            values = np.array(json.load(f) + [None], dtype=object)  # code -1 -> values[-1] = missing
+        return pd.array(values[data], dtype=TEXT)
+    if dtype == NULLABLE_INT:
+        return pd.arrays.IntegerArray(np.array(data), np.load(mask_path))
+    return np.array(data)
+
+
+def read_store(directory, columns=None, meta=None):
+    """DataFrame with `columns` (default: all, in schema order) of the store in `directory`."""
+    meta = meta or read_meta(directory)
+    schema = meta["schema"]
+    columns = list(schema) if columns is None else list(columns)
+    unknown = [column for column in columns if column not in schema]
+    if unknown:
+        raise KeyError(f"unknown columns {unknown}; available: {list(schema)}")
+    positions = {column: position for position, column in enumerate(schema)}
+    return pd.DataFrame(
+        {column: _read_column(directory, positions[column], schema[column]) for column in columns},
+        index=pd.RangeIndex(meta["rows"]),
+    )
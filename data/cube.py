@@ -0,0 +1,230 @@
+# ---------------------------------------------------------
+# Aggregate Cubes of the Breach Datasets
+# A cube holds, for every observed combination of its dimensions, the number of rows, the position
+# of the first row and the count, sum, min, max and sum of squares of each measure. Views such as
+# "breaches per sector", "people affected per industry x information type" or the group moments of
+# the Welch / ANOVA tests are roll-ups and slices of these cells, so they cost O(cells) instead of
+# O(rows). The named cubes are built once per dataset version and kept in the loader's cache
+# directory next to the columnar store. Cubes of separate chunks of rows merge into the cube of all
+# of them (see data/streaming.py).
+# ---------------------------------------------------------
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data.breaches import load_breach_index
+from data.columnar import CATEGORY, NULLABLE_INT, read_meta, read_store, write_store
+from data.loader import CACHE_VERSION, cache_dir, dataset_version, load_kaggle, load_washington
+from data.normalization import SECTOR_RULES, normalize
+from instrumentation.stages import stage, traced
+
+# Bump whenever the cube layout or the fact tables below change so stale cubes are not reused
+CUBE_VERSION = 1
+
+AGGREGATES = ("count", "sum", "min", "max", "sumsq")
+
+# How each column of the cells combines when cells are rolled up
+_ROLLUP = {"rows": "sum", "first_row": "min", "count": "sum", "sum": "sum", "min": "min", "max": "max", "sumsq": "sum"}
+
+
+def measure_column(measure, aggregate):
+    """Column of the cells holding `aggregate` of `measure`, e.g. 'records lost_sum'."""
+    return f"{measure}_{aggregate}"
+
+
+class AggregateCube:
+    """Aggregates of `measures` for every observed combination of `dimensions`.
+
+    Attributes:
+        dimensions: dimension columns; missing dimension values form cells of their own.
+        measures: measure columns.
+        cells: DataFrame indexed by the dimensions (sorted) with the columns 'rows', 'first_row' and
+            '<measure>_<aggregate>' for every measure and aggregate in AGGREGATES. 'first_row' is
+            the smallest position of the rows of a cell, only used to order cells by appearance.
+    """
+
+    def __init__(self, cells, dimensions, measures=()):
+        self.cells = cells
+        self.dimensions = list(dimensions)
+        self.measures = list(measures)
+
+    @classmethod
+    def build(cls, df, dimensions, measures=(), positions=None):
+        """Cube of the rows of `df` (one pass over the rows).
+
+        `positions` orders the rows for 'first_row' (default: 0, 1, ...); chunks of a larger
+        table pass the positions of their rows in it, so their cubes can be merged.
+        """
+        dimensions, measures = list(dimensions), list(measures)
+        data = df[dimensions].copy()
+        data["_row"] = np.arange(len(df)) if positions is None else np.asarray(positions)
+        spec = {"rows": ("_row", "size"), "first_row": ("_row", "min")}
+        for measure in measures:
+            data[measure] = df[measure]
+            data[f"_{measure}_squared"] = df[measure].astype(float) ** 2
+            spec[measure_column(measure, "count")] = (measure, "count")
+            spec[measure_column(measure, "sum")] = (measure, "sum")
+            spec[measure_column(measure, "min")] = (measure, "min")
+            spec[measure_column(measure, "max")] = (measure, "max")
+            spec[measure_column(measure, "sumsq")] = (f"_{measure}_squared", "sum")
+        cells = data.groupby(dimensions, observed=True, dropna=False, sort=True).agg(**spec)
+        return cls(cells, dimensions, measures)
+
+    def merge(self, other):
+        """Cube of the rows of both cubes (same dimensions and measures)."""
+        cells = pd.concat([self.cells.reset_index(), other.cells.reset_index()], ignore_index=True)
+        for dimension in self.dimensions:
+            # Chunks have categories of their own; the merged labels get sorted categories again
+            if isinstance(self.cells.index.get_level_values(dimension).dtype, pd.CategoricalDtype):
+                cells[dimension] = cells[dimension].astype(object).astype("category")
+        merged = cells.groupby(self.dimensions, observed=True, dropna=False, sort=True).agg(self._spec())
+        return AggregateCube(merged, self.dimensions, self.measures)
+
+    def _spec(self):
+        spec = {"rows": _ROLLUP["rows"], "first_row": _ROLLUP["first_row"]}
+        for measure in self.measures:
+            for aggregate in AGGREGATES:
+                spec[measure_column(measure, aggregate)] = _ROLLUP[aggregate]
+        return spec
+
+    def rollup(self, *dimensions):
+        """Cells aggregated over every dimension not in `dimensions`.
+
+        Like groupby, rows with a missing value in one of the kept dimensions are left out.
+        Without dimensions, returns the grand total as a one-row DataFrame.
+        """
+        if not dimensions:
+            totals = self.cells.agg(self._spec())
+            return totals.to_frame().T
+        return self.cells.groupby(level=list(dimensions), observed=True, sort=True).agg(self._spec())
+
+    def slice(self, criteria):
+        """Cube restricted to the cells whose dimensions match `criteria` ({dimension: value or list})."""
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dimension, values in criteria.items():
+            values = values if isinstance(values, (list, tuple, set, pd.Index, np.ndarray)) else [values]
+            mask &= self.cells.index.get_level_values(dimension).isin(values)
+        return AggregateCube(self.cells[mask], self.dimensions, self.measures)
+
+    def counts(self, dimension, labels=None):
+        """Rows per value of `dimension`, largest first (ties in order of appearance), like value_counts().
+
+        `labels` (dict or callable) maps the values to display labels first; values mapped to the
+        same label are merged and values mapped to a missing label are left out.
+        """
+        rolled = self.rollup(dimension)[["rows", "first_row"]]
+        if labels is not None:
+            keys = pd.Index(rolled.index.map(labels), name=dimension)
+            rolled = rolled.groupby(keys, dropna=True).agg({"rows": "sum", "first_row": "min"})
+        ordered = rolled.sort_values("first_row").sort_values("rows", ascending=False, kind="stable")
+        # Plain labels: a categorical index would bring back the categories without rows
+        return pd.Series(ordered["rows"].to_numpy(), index=pd.Index(np.asarray(ordered.index), name=dimension), name="count")
+
+    def total(self, dimensions, measure):
+        """Sum of `measure` per value of `dimensions` (one dimension or a list of them)."""
+        dimensions = [dimensions] if isinstance(dimensions, str) else list(dimensions)
+        return self.rollup(*dimensions)[measure_column(measure, "sum")].rename(measure)
+
+    def table(self, row, column, value="rows"):
+        """(row x column) table of one cell column, 0 for combinations without rows."""
+        return self.rollup(row, column)[value].unstack(fill_value=0)
+
+    def moments(self, dimension, measure):
+        """Count, mean and sample variance of `measure` per value of `dimension`, in order of appearance.
+
+        Same layout as stats.pairwise.group_moments, for welch_from_moments and anova_from_moments.
+        """
+        rolled = self.rollup(dimension).sort_values("first_row")
+        n = rolled[measure_column(measure, "count")].to_numpy(dtype=float)
+        total = rolled[measure_column(measure, "sum")].to_numpy(dtype=float, na_value=np.nan)
+        squares = rolled[measure_column(measure, "sumsq")].to_numpy(dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = total / n
+            var = np.where(n > 1, (squares - total * mean) / (n - 1), np.nan)
+        return pd.DataFrame(
+            {"count": n, "mean": np.where(n > 0, mean, np.nan), "var": np.maximum(var, 0)},
+            index=pd.Index(rolled.index, name=dimension),
+        )
+
+
+# ----- Named cubes of the datasets -----
+
+def _washington_rows():
+    return load_washington(columns=["IndustryType", "InformationType"])
+
+
+def _washington_breaches():
+    return load_breach_index().breaches
+
+
+def _washington_exposures():
+    # One row per distinct (breach, information type) pair
+    index = load_breach_index()
+    breaches = index.breaches.iloc[index.breach_codes]
+    return pd.DataFrame({
+        "IndustryType": breaches["IndustryType"].array,
+        "InformationType": pd.Categorical.from_codes(index.info_codes, categories=index.information_types),
+        "WashingtoniansAffected": breaches["WashingtoniansAffected"].to_numpy(),
+    })
+
+
+def _kaggle_rows():
+    df = load_kaggle(columns=["sector", "data sensitivity", "method", "records lost"])
+    df["sector"], dropped = normalize(df["sector"], SECTOR_RULES)
+    return df[~dropped]
+
+
+# Cube name -> (dataset, fact table, dimensions, measures)
+CUBES = {
+    "washington": ("washington", _washington_rows, ["IndustryType", "InformationType"], []),
+    "breaches": ("washington", _washington_breaches, ["IndustryType", "DataBreachCause"], ["WashingtoniansAffected"]),
+    "exposures": ("washington", _washington_exposures, ["IndustryType", "InformationType"], ["WashingtoniansAffected"]),
+    "kaggle": ("kaggle", _kaggle_rows, ["sector", "data sensitivity", "method"], ["records lost"]),
+}
+
+# The sector rules shape the Kaggle cells, so they are part of a cube's version as well
+_RULES_HASH = hashlib.sha256(json.dumps(SECTOR_RULES).encode()).hexdigest()
+
+# In-process memo: (cube name, dataset version) -> cube
+_cubes = {}
+
+
+def _schema(cells):
+    schema = {}
+    for column, dtype in cells.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            schema[column] = CATEGORY
+        elif str(dtype) == NULLABLE_INT:
+            schema[column] = NULLABLE_INT
+        else:
+            schema[column] = str(dtype)
+    return schema
+
+
+@traced()
+def load_cube(name):
+    """Memoized AggregateCube `name` (see CUBES) of the current version of its dataset."""
+    dataset, facts, dimensions, measures = CUBES[name]
+    version = dataset_version(dataset)
+    key = (name, version)
+    if key in _cubes:
+        return _cubes[key]
+
+    directory = os.path.join(cache_dir(), "cubes", name)
+    # The loader's CACHE_VERSION covers its cleaning and schemas, which shape the cells as much as the CSV
+    expected = {"version": CUBE_VERSION, "dataset": version, "cleaning": CACHE_VERSION, "rules": _RULES_HASH}
+    meta = read_meta(directory)
+    if meta is not None and all(meta.get(field) == value for field, value in expected.items()):
+        with stage("read_cube"):
+            cube = AggregateCube(read_store(directory, meta=meta).set_index(dimensions), dimensions, measures)
+    else:
+        with stage("build_cube"):
+            cube = AggregateCube.build(facts(), dimensions, measures)
+            flat = cube.cells.reset_index()
+            write_store(directory, flat, _schema(flat), expected)
+    _cubes[key] = cube
+    return cube
@@ -0,0 +1,238 @@
+# ---------------------------------------------------------
+# Shared Dataset Loader
+# Loads the Washington State and Kaggle breach datasets once per run and applies the typing/cleaning
+# every hypothesis script relies on. Cleaned datasets are kept on disk in a columnar store (see
+# columnar.py) that is rebuilt whenever the source CSV changes (checked by mtime first, then by
+# content hash); readers ask for the columns they need and only those are read and memoized.
+# ---------------------------------------------------------
+
+import hashlib
+import json
+import os
+import warnings
+
+import pandas as pd
+
+from data.columnar import CATEGORY, NULLABLE_INT, TEXT, apply_schema, read_meta, read_store, write_store
+from data.parsing import parse_counts
+from instrumentation.stages import stage, traced
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(DATA_DIR, ".cache")
+
+WASHINGTON_CSV = os.path.join(DATA_DIR, "Washington_DB.csv")
+KAGGLE_CSV = os.path.join(DATA_DIR, "Kaggle_DB_updated.csv")
+# Written by Datasets_Cleaning.py; read instead of the raw Washington CSV when present
+WASHINGTON_CLEAN_CSV = os.path.join(DATA_DIR, "Washington_DB_cleaned.csv")
+
+# Directory with the same file names to read instead of data/ (e.g. the synthetic benchmark datasets)
+DATA_DIR_ENV = "BREACH_DATA_DIR"
+
+# Bump whenever the cleaning or the schemas below change so stale caches are not reused
+CACHE_VERSION = 5
+
+DATETIME = "datetime64[us]"
+
+# Column -> dtype of the cleaned datasets, in column order. CSV columns not listed are dropped.
+# Low-cardinality dimensions are categoricals (int codes + sorted categories): groupby and crosstab
+# work on the codes, and display renames only touch the categories (see data/categorical.py).
+WASHINGTON_SCHEMA = {
+    "Id": "int64",
+    "DateAware": DATETIME,
+    "DateSubmitted": DATETIME,
+    "DataBreachCause": CATEGORY,
+    "DateStart": DATETIME,
+    "DateEnd": DATETIME,
+    "Name": TEXT,
+    "CyberattackType": CATEGORY,
+    "WashingtoniansAffected": "float64",
+    "IndustryType": CATEGORY,
+    "BusinessType": CATEGORY,
+    "InformationType": CATEGORY,
+    "Year": NULLABLE_INT,
+    "WashingtoniansAffectedRange": CATEGORY,
+    "BreachLifecycleRange": CATEGORY,
+    "EntityState": CATEGORY,
+}
+KAGGLE_SCHEMA = {
+    "organisation": TEXT,
+    "alternative name": TEXT,
+    "records lost": NULLABLE_INT,
+    "year": NULLABLE_INT,
+    "date": TEXT,
+    "story": TEXT,
+    "sector": CATEGORY,
+    "method": CATEGORY,
+    "interesting story": TEXT,
+    "data sensitivity": "float64",
+    "displayed records": TEXT,
+    "source name": TEXT,
+    "1st source link": TEXT,
+    "2nd source link": TEXT,
+    "ID": "float64",
+    "records lost approximated": "bool",
+}
+
+# In-process memo: source path -> {column: cleaned Series}
+_frames = {}
+
+
+def data_dir():
+    """Directory the datasets are read from: $BREACH_DATA_DIR if set, data/ otherwise."""
+    return os.path.abspath(os.environ.get(DATA_DIR_ENV) or DATA_DIR)
+
+
+def dataset_path(name):
+    """Path of the CSV file of dataset `name` ('washington' or 'kaggle'), preferring cleaned artifacts."""
+    candidates = [os.path.join(data_dir(), os.path.basename(path)) for path in _DATASETS[name][0]]
+    return next((path for path in candidates if os.path.exists(path)), candidates[-1])
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_dir():
+    """Cache directory of the current data directory (data/.cache for data/ itself)."""
+    # Each data directory keeps its own cache, so switching directories never evicts the other
+    return CACHE_DIR if data_dir() == DATA_DIR else os.path.join(data_dir(), ".cache")
+
+
+def _store_dir(name):
+    return os.path.join(cache_dir(), name)
+
+
+def _valid_store(name, source):
+    """Metadata of the store of `name` if it was built from the current `source`, otherwise None."""
+    meta = read_meta(_store_dir(name))
+    if meta is None or meta.get("version") != CACHE_VERSION or meta.get("source") != source:
+        return None
+
+    stat = os.stat(source)
+    if meta["mtime_ns"] == stat.st_mtime_ns and meta["size"] == stat.st_size:
+        return meta
+
+    # mtime changed (e.g. fresh checkout): only rebuild if the content did as well
+    if meta["sha256"] != _file_digest(source):
+        return None
+    meta["mtime_ns"], meta["size"] = stat.st_mtime_ns, stat.st_size
+    meta_path = os.path.join(_store_dir(name), "meta.json")
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+    return meta
+
+
+def clean_frame(name, df):
+    """Clean and type raw CSV rows of dataset `name` (a whole file or a chunk of it) like the loader does."""
+    _, clean, schema = _DATASETS[name]
+    return apply_schema(clean(df), schema)
+
+
+def _build_store(name, source):
+    """Parse and clean the CSV of `name`, store it and return the cleaned frame."""
+    schema = _DATASETS[name][2]
+    stat = os.stat(source)
+    frame = clean_frame(name, pd.read_csv(source))
+    write_store(_store_dir(name), frame, schema, {
+        "version": CACHE_VERSION,
+        "source": source,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": _file_digest(source),
+    })
+    return frame
+
+
+def _clean_washington(df):
+    # Rows without an Id cannot be attributed to a breach; drop them (and say so) instead of failing
+    ids = pd.to_numeric(df["Id"], errors="coerce")
+    if ids.isna().any():
+        warnings.warn(f"dropped {int(ids.isna().sum())} Washington rows without a valid Id")
+        df, ids = df[ids.notna()].copy(), ids[ids.notna()]
+    df["Id"] = ids.astype("int64")
+    df["Year"] = pd.to_numeric(df["Year"], errors="coerce")
+    df["WashingtoniansAffected"] = pd.to_numeric(df["WashingtoniansAffected"], errors="coerce")
+    for col in ["DateAware", "DateSubmitted"]:
+        df[col] = pd.to_datetime(df[col], format="%m/%d/%Y %I:%M:%S %p", errors="coerce")
+    for col in ["DateStart", "DateEnd"]:
+        df[col] = pd.to_datetime(df[col], format="ISO8601", errors="coerce")
+    return df
+
+
+def _clean_kaggle(df):
+    df.columns = df.columns.str.strip()  # 'year   ' -> 'year'
+    df["data sensitivity"] = pd.to_numeric(df["data sensitivity"], errors="coerce")
+    df["ID"] = pd.to_numeric(df["ID"], errors="coerce")
+    df["year"] = pd.to_numeric(df["year"], errors="coerce")
+    # Int64 counts; estimates such as '3m' are kept, but flagged
+    df["records lost"], df["records lost approximated"] = parse_counts(df["records lost"])
+    return df
+
+
+# Dataset -> (candidate CSVs in order of preference, cleaning, schema)
+_DATASETS = {
+    "washington": ((WASHINGTON_CLEAN_CSV, WASHINGTON_CSV), _clean_washington, WASHINGTON_SCHEMA),
+    "kaggle": ((KAGGLE_CSV,), _clean_kaggle, KAGGLE_SCHEMA),
+}
+
+
+def _load(name, columns=None):
+    schema = _DATASETS[name][2]
+    columns = list(schema) if columns is None else list(columns)
+    unknown = [column for column in columns if column not in schema]
+    if unknown:
+        raise KeyError(f"unknown {name} columns {unknown}; available: {list(schema)}")
+
+    source = dataset_path(name)
+    memo = _frames.setdefault(source, {})
+    missing = [column for column in columns if column not in memo]
+    if missing:
+        with stage("read_cache"):
+            meta = _valid_store(name, source)
+            if meta is not None:
+                memo.update(read_store(_store_dir(name), missing, meta).items())
+        if meta is None:
+            with stage("parse_csv"):
+                memo.update(_build_store(name, source).items())
+    # Scripts modify their frames in place, so never hand out the memoized columns themselves
+    return pd.DataFrame({column: memo[column] for column in columns}).copy()
+
+
+def dataset_version(name):
+    """Content hash (sha256) of the CSV dataset `name` is currently read from."""
+    source = dataset_path(name)
+    meta = _valid_store(name, source)
+    if meta is None:
+        with stage("parse_csv"):
+            _frames.setdefault(source, {}).update(_build_store(name, source).items())
+        meta = read_meta(_store_dir(name))
+    return meta["sha256"]
+
+
+@traced()
+def load_washington(columns=None):
+    """Cleaned Washington State dataset (one row per breach and information type).
+
+    Pass `columns` to read only those columns (see WASHINGTON_SCHEMA).
+    """
+    return _load("washington", columns)
+
+
+@traced()
+def load_kaggle(columns=None):
+    """Cleaned Kaggle / McCandless dataset (one row per breach, stripped column names).
+
+    'records lost' is parsed to Int64; 'records lost approximated' flags estimated values.
+    Pass `columns` to read only those columns (see KAGGLE_SCHEMA).
+    """
+    return _load("kaggle", columns)
+
+
+def clear_memory_cache():
+    """Forget the in-process columns so the next load goes back to the disk cache."""
+    _frames.clear()
@@ -0,0 +1,74 @@
+# ---------------------------------------------------------
+# Table-Driven Label Normalization
+# The raw Kaggle 'sector' column mixes spellings ('financial', 'health '), compound entries
+# ('tech, web') and sectors outside the scope of the analysis. SECTOR_RULES describes the clean-up as
+# an ordered table of rules; normalize() evaluates the table once over the distinct labels (each rule
+# is one vectorized string operation) and maps the result back to the rows through their codes.
+# Both Datasets_Cleaning.py and the hypothesis scripts use the same table.
+# ---------------------------------------------------------
+
+import re
+
+import numpy as np
+import pandas as pd
+
+# Result of a rule that removes the matching rows
+DROP = None
+
+# Rule kinds: "exact" compares the label, "contains" looks for a substring and "normalized" compares the
+# stripped, lower-cased label. A pattern is a string or a list of alternatives.
+RULE_KINDS = ("exact", "contains", "normalized")
+
+BUSINESS_KEYWORDS = ['app', 'gaming', 'retail', 'tech', 'telecoms', 'transport', 'web']
+
+# (kind, pattern, result), applied in order: every rule sees the labels produced by the previous ones
+SECTOR_RULES = [
+    ("exact", ['financial', 'finance'], 'Finance'),
+    ("exact", 'academic', 'Education'),
+    ("contains", 'government', 'Government'),
+    ("contains", 'military', 'military'),
+    ("contains", 'misc', 'other'),
+    ("contains", ['legal', 'NGO'], DROP),
+    ("contains", BUSINESS_KEYWORDS, 'Business'),
+    ("exact", ['military', 'other'], DROP),
+    ("normalized", 'health', 'Health'),
+]
+
+
+def _matches(labels, kind, patterns):
+    if kind == "exact":
+        return labels.isin(patterns)
+    if kind == "contains":
+        return labels.str.contains("|".join(map(re.escape, patterns)), regex=True).fillna(False).astype(bool)
+    if kind == "normalized":
+        return labels.str.strip().str.lower().isin(patterns)
+    raise ValueError(f"unknown rule kind '{kind}' (expected one of {', '.join(RULE_KINDS)})")
+
+
+def normalize_labels(labels, rules):
+    """Apply `rules` to an array of distinct labels; dropped labels become <NA>."""
+    labels = pd.Series(labels, dtype="string")
+    for kind, pattern, result in rules:
+        patterns = [pattern] if isinstance(pattern, str) else list(pattern)
+        labels = labels.mask(_matches(labels, kind, patterns), result)
+    return labels
+
+
+def normalize(values, rules=SECTOR_RULES):
+    """Normalize a column with `rules` into (categorical Series, dropped bool Series).
+
+    The rules run once per distinct value. Rows whose label was dropped by a rule are <NA> in the
+    result and flagged; missing values stay missing and are not flagged.
+    """
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    labels = normalize_labels(np.asarray(uniques, dtype=object), rules)
+
+    label_codes, categories = pd.factorize(labels, sort=True)
+    recode = np.append(label_codes, -1)  # code -1 (missing) stays -1
+    dropped = np.append(labels.isna().to_numpy(), False)
+    normalized = pd.Categorical.from_codes(recode[codes], categories=categories)
+    return (
+        pd.Series(normalized, index=values.index, name=values.name),
+        pd.Series(dropped[codes], index=values.index, name=values.name),
+    )
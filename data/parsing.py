@@ -0,0 +1,62 @@
+# ---------------------------------------------------------
+# Parsing of Free-Text Counts
+# "records lost" is typed by hand: thousands separators ("15,000,000"), magnitude suffixes used for
+# estimates (the original sheet asks to "use 3m, 4m, 5m or 10m to approximate unknown figures") and
+# hedges such as "~2m", "over 1bn" or "500k+". parse_counts() turns such a column into int64 once, at
+# ingest, and flags the values that were only approximations.
+# ---------------------------------------------------------
+
+import re
+
+import numpy as np
+import pandas as pd
+
+MAGNITUDES = {
+    "k": 10**3, "thousand": 10**3,
+    "m": 10**6, "mn": 10**6, "mil": 10**6, "million": 10**6,
+    "b": 10**9, "bn": 10**9, "billion": 10**9,
+}
+
+_COUNT = re.compile(
+    r"""^\s*
+    (?P<hedge>~|<|>|c\.|ca\.|about|approx\.?|approximately|around|over|more\ than|up\ to)?\s*
+    (?P<number>\d[\d,\s]*(?:\.\d+)?)\s*
+    (?P<suffix>thousand|million|billion|mil|mn|bn|k|m|b)?\s*
+    (?P<plus>\+)?\s*$""",
+    re.IGNORECASE | re.VERBOSE,
+)
+
+
+def parse_counts(values):
+    """Parse a column of hand-typed counts into (Int64 Series, approximated bool Series).
+
+    Every distinct string is parsed once and the results are broadcast back to the rows. Values
+    that are not a count (empty, 'unknown', ...) become <NA> and are not flagged.
+
+    >>> counts, approximated = parse_counts(["15,000,000", "~2m", "unknown", None])
+    >>> counts.tolist(), approximated.tolist()
+    ([15000000, 2000000, <NA>, <NA>], [False, True, False, False])
+    >>> counts, approximated = parse_counts([np.nan, np.nan])
+    >>> str(counts.dtype), counts.tolist(), approximated.tolist()
+    ('Int64', [<NA>, <NA>], [False, False])
+    """
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values.astype("string"))
+    parts = pd.Series(uniques, dtype="string").str.extract(_COUNT)
+
+    digits = parts["number"].str.replace(r"[,\s]", "", regex=True)
+    number = pd.to_numeric(digits, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    suffix = parts["suffix"].str.lower()
+    factor = suffix.map(MAGNITUDES).fillna(1).to_numpy(dtype=float)
+    approximated = (parts["hedge"].notna() | suffix.notna() | parts["plus"].notna()).to_numpy(dtype=bool)
+
+    parsed = np.round(number * factor)
+    valid = ~np.isnan(parsed)
+
+    # Missing rows (code -1) read an extra <NA> slot at the end, so the lookup is never empty
+    valid = np.append(valid, False)
+    counts = pd.array(np.where(valid, np.append(parsed, 0), 0).astype(np.int64), dtype="Int64")
+    counts[~valid] = pd.NA
+    flags = np.append(approximated, False) & valid
+    rows = np.where(codes >= 0, codes, len(uniques))
+    return pd.Series(counts[rows], index=values.index), pd.Series(flags[rows], index=values.index)
@@ -0,0 +1,151 @@
+# ---------------------------------------------------------
+# Chunked Streaming of the Breach Datasets
+# For feeds that do not fit in memory: the CSV is read in fixed-size chunks, every chunk is cleaned
+# and typed like the loader's frames and then folded into mergeable partial aggregates, namely the
+# cells of the named aggregate cubes (counts, sums and moments; see data/cube.py) and anything else
+# with an update(df) method, such as a ContingencyTable or a GroupedBoxSketch. Peak memory depends on
+# the chunk size and the number of cells, not on the number of rows. The one exception is the set of
+# breaches already seen, which the breach-level cubes need to count every breach once (8 bytes per
+# distinct breach or (breach, information type) pair).
+# ---------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+from data.cube import CUBES, AggregateCube, load_cube
+from data.loader import clean_frame, dataset_path
+from data.normalization import SECTOR_RULES, normalize
+from instrumentation.stages import stage, traced
+
+CHUNK_ROWS = 100_000
+
+
+def read_chunks(name, chunk_rows=CHUNK_ROWS):
+    """Cleaned chunks of dataset `name` ('washington' or 'kaggle'), typed like load_washington/load_kaggle.
+
+    The index of every chunk holds the positions of its rows in the file.
+    """
+    with pd.read_csv(dataset_path(name), chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            with stage("clean"):
+                yield clean_frame(name, chunk)
+
+
+class _SeenKeys:
+    """Sorted int64 keys of the rows seen in earlier chunks."""
+
+    def __init__(self):
+        self.keys = np.zeros(0, dtype=np.int64)
+
+    def first_seen(self, keys):
+        """Mask of the `keys` seen for the first time (in this chunk and before); remembers them."""
+        keys = np.asarray(keys, dtype=np.int64)
+        _, first = np.unique(keys, return_index=True)
+        new = np.zeros(len(keys), dtype=bool)
+        new[first] = True
+        positions = np.minimum(np.searchsorted(self.keys, keys), max(len(self.keys) - 1, 0))
+        if len(self.keys):
+            new &= self.keys[positions] != keys
+        self.keys = np.union1d(self.keys, keys[new])
+        return new
+
+
+# ----- Fact chunks of the named cubes: (rows, positions) per chunk of the dataset -----
+# They match the fact tables of data/cube.py; positions only need to order the rows the same way
+# (except for the exposures, whose order is completed once all chunks are folded, see _FINISH).
+
+def _washington_rows():
+    def facts(chunk):
+        return chunk, chunk.index
+    return facts
+
+
+def _washington_breaches():
+    # One row per breach Id, like BreachIndex.breaches (which is sorted by Id, hence Id as position)
+    seen = _SeenKeys()
+
+    def facts(chunk):
+        rows = chunk[seen.first_seen(chunk["Id"])]
+        return rows, rows["Id"]
+    return facts
+
+
+def _washington_exposures():
+    # One row per distinct (breach, information type) pair, like BreachIndex's incidence pairs. Those
+    # are ordered by breach Id and then information type; the Id alone leaves ties, see _order_exposures.
+    seen = _SeenKeys()
+
+    def facts(chunk):
+        exposed = chunk.dropna(subset=["InformationType"])
+        keys = pd.util.hash_pandas_object(exposed[["Id", "InformationType"]], index=False)
+        rows = exposed[seen.first_seen(keys.to_numpy().view(np.int64))]
+        return rows, rows["Id"]
+    return facts
+
+
+def _kaggle_rows():
+    def facts(chunk):
+        chunk = chunk.copy()
+        chunk["sector"], dropped = normalize(chunk["sector"], SECTOR_RULES)
+        rows = chunk[~dropped.to_numpy()]
+        return rows, rows.index
+    return facts
+
+
+def _order_exposures(cube):
+    # Every cell's first_row is the Id of a pair with the cell's own information type, so ranking the
+    # cells by (Id, information type) orders them like the incidence pairs of the loaded cube
+    cells = cube.cells.copy()
+    keys = pd.DataFrame({
+        "first_row": cells["first_row"].to_numpy(),
+        "InformationType": cells.index.get_level_values("InformationType").astype(str),
+    })
+    order = keys.sort_values(["first_row", "InformationType"]).index.to_numpy()
+    ranks = np.empty(len(cells), dtype=np.int64)
+    ranks[order] = np.arange(len(cells))
+    cells["first_row"] = ranks
+    return AggregateCube(cells, cube.dimensions, cube.measures)
+
+
+# Cube name -> factory of its (stateful) chunk fact function
+_CHUNK_FACTS = {
+    "washington": _washington_rows,
+    "breaches": _washington_breaches,
+    "exposures": _washington_exposures,
+    "kaggle": _kaggle_rows,
+}
+
+# Cube name -> final pass over its folded cube
+_FINISH = {"exposures": _order_exposures}
+
+
+@traced()
+def stream_cubes(names, partials=None, chunk_rows=CHUNK_ROWS):
+    """{name: AggregateCube} of the named cubes (see data/cube.py), folded chunk by chunk.
+
+    Every dataset is read once, however many of its cubes are requested. `partials` maps cube
+    names to further partial aggregates with an update(df) method (e.g. a GroupedBoxSketch),
+    which get the same fact rows as the cube chunk by chunk.
+    """
+    partials = partials or {}
+    cubes = {}
+    for dataset in dict.fromkeys(CUBES[name][0] for name in names):
+        members = [name for name in names if CUBES[name][0] == dataset]
+        facts = {name: _CHUNK_FACTS[name]() for name in members}
+        for chunk in read_chunks(dataset, chunk_rows):
+            for name in members:
+                rows, positions = facts[name](chunk)
+                with stage("aggregate"):
+                    _, _, dimensions, measures = CUBES[name]
+                    part = AggregateCube.build(rows, dimensions, measures, positions)
+                    cubes[name] = part if name not in cubes else cubes[name].merge(part)
+                    for partial in partials.get(name, ()):
+                        partial.update(rows)
+    return {name: _FINISH.get(name, lambda cube: cube)(cubes[name]) for name in names}
+
+
+def load_cubes(names, streaming=False):
+    """{name: AggregateCube}: the cached cubes (load_cube), or with `streaming` cubes folded from chunks."""
+    if streaming:
+        return stream_cubes(names)
+    return {name: load_cube(name) for name in names}
@@ -1,18 +1,81 @@
-import matplotlib.pyplot as plt
-import Hypothesis1.Hypothesis1 as H1
-import Hypothesis2.DataExplosure as H2_1
-import Hypothesis2.ExposureIndustry as H2_2
-import Hypothesis3.kaggle as H3_kaggle
-import Hypothesis3.WA as H3_WA
-import Hypothesis4.DecisionTree as H4_DecisionTree
-import Hypothesis4.Visualization as H4_Visualization
-import sys
+import argparse
+import contextlib
+import importlib
+import io
+import json
 import os
+import sys
+import time
+import traceback
 import warnings
 from contextlib import contextmanager
 
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Registry of all hypothesis scripts: key -> (label, module, inputs), in the order they are run.
+# Modules are only imported once selected, so refreshing a single hypothesis does not pay
+# for the sklearn/statsmodels/graphviz imports of the others.
+# `inputs` lists the columns each script reads per dataset (None = every column, e.g. for
+# describe()); the incremental build only hashes these, so unrelated column edits rebuild nothing.
+HYPOTHESES = {
+    "H1": ("Hypothesis 1", "Hypothesis1.Hypothesis1", {
+        "washington": ["IndustryType", "InformationType"],
+        "kaggle": ["sector", "data sensitivity"],
+    }),
+    "H2-DataExposure": ("Hypothesis 2 - Data Exposure", "Hypothesis2.DataExplosure", {
+        "washington": ["IndustryType", "InformationType"],
+        "kaggle": ["data sensitivity"],
+    }),
+    "H2-ExposureIndustry": ("Hypothesis 2 - Exposure Industry", "Hypothesis2.ExposureIndustry", {
+        "washington": ["Id", "IndustryType", "InformationType", "WashingtoniansAffected"],
+        "kaggle": ["sector", "data sensitivity", "records lost"],
+    }),
+    "H3-Kaggle": ("Hypothesis 3 - Kaggle Dataset", "Hypothesis3.kaggle", {"kaggle": None}),
+    "H3-WA": ("Hypothesis 3 - Washington Dataset", "Hypothesis3.WA", {"washington": None}),
+    "H4-DecisionTree": ("Hypothesis 4 - Decision Tree", "Hypothesis4.DecisionTree", {
+        "kaggle": ["sector", "data sensitivity", "records lost", "method"],
+    }),
+    "H4-Visualization": ("Hypothesis 4 - Visualization", "Hypothesis4.Visualization", {
+        "kaggle": ["records lost", "method"],
+    }),
+}
+
+# Hypotheses whose main() can read the datasets in chunks (main(streaming=True), see data/streaming.py)
+STREAMING = {"H1", "H2-DataExposure", "H2-ExposureIndustry", "H3-Kaggle", "H3-WA"}
+# Hypotheses whose main() can add the (slower) permutation chi-square test (main(permutation=True))
+PERMUTATION = {"H1"}
+# Hypotheses whose main() takes the hyperparameter search mode and fit budget (see Hypothesis4/DecisionTree.py)
+SEARCH = {"H4-DecisionTree"}
+SEARCH_MODES = ("grid", "random", "halving")
+
+PLOT_DIRS = [f"Hypothesis{i}/Hypothesis{i}_Plots" for i in range(1, 5)]
+# cProfile dumps written by --profile (open with `python -m pstats` or snakeviz)
+PROFILE_DIR = os.path.join(ROOT, "profiles")
+
+
+def select_hypotheses(spec):
+    """Resolve a comma-separated list of registry keys (e.g. 'H1,H3-WA') into keys in run order.
+
+    A bare hypothesis number such as 'H2' selects every script of that hypothesis.
+    """
+    if not spec:
+        return list(HYPOTHESES)
+    wanted = set()
+    for token in spec.split(","):
+        token = token.strip().lower()
+        if not token:
+            continue
+        matches = [key for key in HYPOTHESES if key.lower() == token or key.lower().split("-")[0] == token]
+        if not matches:
+            raise ValueError(f"unknown hypothesis '{token}' (see --list)")
+        wanted.update(matches)
+    return [key for key in HYPOTHESES if key in wanted]
+
+
 @contextmanager
 def suppress_show():
+    import matplotlib.pyplot as plt
+
     original_show = plt.show
     plt.show = lambda *args, **kwargs: None
     try:
@@ -21,42 +84,243 @@ def suppress_show():
         plt.show = original_show
 
 
-@contextmanager
-def suppress_print_and_warnings():
-    # Save original stdout
-    original_stdout = sys.stdout
-    # Redirect stdout to null
-    sys.stdout = open(os.devnull, 'w')
-    # Suppress warnings
-    warnings.filterwarnings('ignore')
+def run_hypothesis(label, module_name, trace=False, profile_path=None, options=None):
+    """Run one hypothesis main(**options) and collect its stdout, warnings, failure, outputs and wall-clock time.
+
+    With `trace`, the stage records of the run (wall/CPU time, tracemalloc peaks) are returned
+    under "trace"; with `profile_path`, a cProfile dump of main() is written there.
+    """
+    import cProfile
+    import tracemalloc
+
+    import matplotlib.pyplot as plt
+    from instrumentation.stages import collect
+    from plotting.rendering import recorded_outputs
+
+    recorded_outputs(reset=True)
+    stdout = io.StringIO()
+    error = None
+    if trace:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if profile_path else None
+    started, start, cpu_start = time.time(), time.perf_counter(), time.process_time()
+    with warnings.catch_warnings(record=True) as caught, collect() as records:
+        warnings.simplefilter("always")
+        with suppress_show(), contextlib.redirect_stdout(stdout):
+            try:
+                module = importlib.import_module(module_name)
+                if profiler:
+                    profiler.runcall(module.main, **(options or {}))
+                else:
+                    module.main(**(options or {}))
+            except Exception:
+                error = traceback.format_exc()
+    seconds, cpu_seconds = time.perf_counter() - start, time.process_time() - cpu_start
+    if trace:
+        tracemalloc.stop()
+    if profiler:
+        os.makedirs(os.path.dirname(profile_path), exist_ok=True)
+        profiler.dump_stats(profile_path)
+    plt.close("all")
+    return {
+        "label": label,
+        "module": module_name,
+        "started": started,
+        "seconds": seconds,
+        "cpu_seconds": cpu_seconds,
+        "trace": records if trace else [],
+        "profile": profile_path,
+        "stdout": stdout.getvalue(),
+        "warnings": [f"{w.category.__name__}: {w.message}" for w in caught],
+        "error": error,
+        "outputs": [os.path.relpath(os.path.abspath(path), ROOT) for path in recorded_outputs(reset=True)],
+    }
+
+
+def _init_worker(render_jobs):
+    # Workers never have a display to draw on
+    import matplotlib
+
+    from plotting.fanout import RENDER_JOBS_ENV
+
+    os.environ["MPLBACKEND"] = "Agg"
+    matplotlib.use("Agg")
+    # Every worker gets its share of the CPUs for its chart loops (see plotting/fanout.py)
+    os.environ[RENDER_JOBS_ENV] = str(render_jobs)
+
+
+def profile_path(key):
+    return os.path.join(PROFILE_DIR, f"{key}.prof")
+
+
+def hypothesis_options(key, streaming=False, permutation=False, search_mode=None, fit_budget=None):
+    """Keyword arguments of the main() of hypothesis `key` for the runner's command-line options."""
+    options = {}
+    if streaming and key in STREAMING:
+        options["streaming"] = True
+    if permutation and key in PERMUTATION:
+        options["permutation"] = True
+    if key in SEARCH:
+        if search_mode is not None:
+            options["search_mode"] = search_mode
+        if fit_budget is not None:
+            options["fit_budget"] = fit_budget
+    return options
+
+
+def run_all(keys, jobs, trace=False, profile=(), **options):
+    """Run the hypotheses `keys` (cProfile the ones in `profile`), serially or in `jobs` processes.
+
+    `options` are the runner's command-line options (see hypothesis_options), e.g. streaming=True
+    makes the hypotheses in STREAMING read their datasets in chunks.
+    """
+    runs = [
+        (*HYPOTHESES[key][:2], trace, profile_path(key) if key in profile else None,
+         hypothesis_options(key, **options))
+        for key in keys
+    ]
+    if jobs == 1:
+        results = []
+        for run in runs:
+            print(f"Running {run[0]}...")
+            results.append(run_hypothesis(*run))
+        return results
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = min(jobs, len(keys))
+    render_jobs = max(1, (os.cpu_count() or 1) // workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(render_jobs,)) as pool:
+        futures = [pool.submit(run_hypothesis, *run) for run in runs]
+        return [future.result() for future in futures]
+
+
+def plan_builds(keys, manifest, force=False, variants=None):
+    """Split `keys` into (stale keys, up-to-date keys) and return the hashes of every key.
+
+    `variants` maps keys to the main() options their outputs depend on (e.g. the search mode);
+    they are part of the version, so outputs built with other options are rebuilt.
+    """
+    from plotting.manifest import input_hash, is_up_to_date, source_version
+
+    def version(key):
+        variant = (variants or {}).get(key)
+        return source_version(HYPOTHESES[key][1]) + (f" {json.dumps(variant, sort_keys=True)}" if variant else "")
+
+    hashes = {key: (version(key), input_hash(HYPOTHESES[key][2])) for key in keys}
+    fresh = [] if force else [key for key in keys if is_up_to_date(manifest, key, *hashes[key])]
+    return [key for key in keys if key not in fresh], fresh, hashes
+
+
+def report(results, total_seconds, verbose=False, skipped=()):
+    width = max(len(result["label"]) for result in results) if results else 0
+    width = max([width] + [len(HYPOTHESES[key][0]) for key in skipped])
+    print("\nSummary:")
+    for key in skipped:
+        print(f"  {HYPOTHESES[key][0]:<{width}}  up to date")
+    for result in results:
+        status = "FAILED" if result["error"] else "ok"
+        notes = f"  ({len(result['warnings'])} warnings)" if result["warnings"] else ""
+        print(f"  {result['label']:<{width}}  {status:<6}  {result['seconds']:7.2f} s  "
+              f"{result['cpu_seconds']:7.2f} s CPU{notes}")
+    print(f"  {'Total wall-clock':<{width}}  {'':<6}  {total_seconds:7.2f} s")
+
+    for result in results:
+        if verbose and result["stdout"]:
+            print(f"\n--- {result['label']}: stdout ---\n{result['stdout'].rstrip()}")
+        if verbose and result["warnings"]:
+            print(f"\n--- {result['label']}: warnings ---")
+            print("\n".join(result["warnings"]))
+        if result["profile"]:
+            print(f"\n--- {result['label']}: profile written to {os.path.relpath(result['profile'], ROOT)} ---")
+            if verbose:
+                import pstats
+
+                pstats.Stats(result["profile"], stream=sys.stdout).sort_stats("cumulative").print_stats(15)
+        if result["error"]:
+            print(f"\n--- {result['label']}: failure ---\n{result['error'].rstrip()}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the plots of all hypotheses.")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of hypotheses to run in parallel (0 = one per CPU core)")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="print the captured stdout and warnings of every hypothesis")
+    parser.add_argument("--only", metavar="KEYS",
+                        help="comma-separated hypotheses to run, e.g. 'H1,H3-WA' (default: all)")
+    parser.add_argument("--list", action="store_true", help="list the available hypotheses and exit")
+    parser.add_argument("--streaming", action="store_true",
+                        help="read the datasets in chunks instead of loading them (H1-H3; for feeds "
+                             "that do not fit in memory)")
+    parser.add_argument("--permutation", action="store_true",
+                        help="add the permutation chi-square test to Hypothesis 1 (a few seconds slower)")
+    parser.add_argument("--search", choices=SEARCH_MODES,
+                        help="hyperparameter search of the decision tree (default: grid; random and halving "
+                             "are much faster)")
+    parser.add_argument("--fit-budget", type=int, metavar="N",
+                        help="upper bound on the model fits of the random/halving search (default: 600)")
+    parser.add_argument("--force", action="store_true",
+                        help="rerun the selected hypotheses even if their inputs and code are unchanged")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="write the wall/CPU time and tracemalloc peak of every stage to PATH "
+                             "(tracemalloc slows the run down)")
+    parser.add_argument("--trace-format", choices=["jsonl", "chrome"],
+                        help="trace format (default: chrome for *.json, jsonl otherwise)")
+    parser.add_argument("--profile", metavar="KEYS",
+                        help="write a cProfile dump of the given hypotheses to profiles/<key>.prof "
+                             "(they are run even if up to date)")
+    args = parser.parse_args()
+    jobs = args.jobs or os.cpu_count()
+
+    if args.list:
+        for key, (label, module_name, _) in HYPOTHESES.items():
+            print(f"{key:<20} {label} ({module_name})")
+        return 0
     try:
-        yield
-    finally:
-        # Restore stdout and warnings after block
-        sys.stdout.close()
-        sys.stdout = original_stdout
-        warnings.resetwarnings()
-
-with suppress_show():
-    # Run all hypothesis scripts
-    print("Running Hypothesis 1...")
-    with suppress_print_and_warnings():
-        H1.main()
-    print("Running Hypothesis 2 - Data Exposure...")
-    with suppress_print_and_warnings():
-        H2_1.main()
-    print("Running Hypothesis 2 - Exposure Industry...")
-    with suppress_print_and_warnings():
-        H2_2.main()
-    print("Running Hypothesis 3 - Kaggle Dataset...")
-    with suppress_print_and_warnings():
-        H3_kaggle.main()
-    print("Running Hypothesis 3 - Washington Dataset...")
-    with suppress_print_and_warnings():
-        H3_WA.main()
-    print("Running Hypothesis 4 - Decision Tree...")
-    with suppress_print_and_warnings():
-        H4_DecisionTree.main()
-    print("Running Hypothesis 4 - Visualization...")
-    with suppress_print_and_warnings():
-        H4_Visualization.main()
+        keys = select_hypotheses(args.only)
+        profile = select_hypotheses(args.profile) if args.profile else []
+    except ValueError as e:
+        parser.error(str(e))
+    keys = [key for key in HYPOTHESES if key in keys or key in profile]
+
+    # The hypothesis scripts save their plots relative to the project root
+    os.chdir(ROOT)
+    for plot_dir in PLOT_DIRS:
+        os.makedirs(plot_dir, exist_ok=True)
+
+    from plotting.manifest import load_manifest, record_build, save_manifest
+
+    start = time.perf_counter()
+    manifest = load_manifest()
+    if args.streaming:
+        # Hashing the input columns would load them whole: streaming runs always rebuild and are not recorded
+        stale, fresh, hashes = keys, [], {}
+    else:
+        search = {"search_mode": args.search, "fit_budget": args.fit_budget}
+        variants = {key: hypothesis_options(key, **search) for key in keys}
+        stale, fresh, hashes = plan_builds(keys, manifest, force=args.force, variants=variants)
+    # Profiled hypotheses always run, otherwise there would be nothing to profile; so do the ones
+    # asked for the permutation test, which only adds to the (not cached) printed results
+    always = set(profile) | (PERMUTATION if args.permutation else set())
+    stale = [key for key in keys if key in stale or key in always]
+    fresh = [key for key in fresh if key not in always]
+    results = run_all(stale, jobs, trace=bool(args.trace), profile=profile, streaming=args.streaming,
+                      permutation=args.permutation, search_mode=args.search,
+                      fit_budget=args.fit_budget) if stale else []
+    for key, result in zip(stale, results):
+        # Failed runs keep their old entries (or none), so they are retried next time
+        if not result["error"] and key in hashes:
+            record_build(manifest, key, *hashes[key], result["outputs"])
+    save_manifest(manifest)
+    report(results, time.perf_counter() - start, verbose=args.verbose, skipped=fresh)
+    if args.trace:
+        from instrumentation.trace import write_trace
+
+        write_trace(results, args.trace, args.trace_format)
+        print(f"\nTrace written to {args.trace}")
+    return 1 if any(result["error"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# ---------------------------------------------------------
+# Stage Timing Hooks
+# The hypothesis scripts mark their phases (load, clean, aggregate, statistics, render, savefig) with
+# `with stage("..."):` and shared helpers are wrapped with `@traced()`. Nothing is measured unless a
+# caller such as generate_all_plots.py --trace or the benchmark harness listens through `collect()`,
+# so the hooks cost a single list check in normal runs.
+# ---------------------------------------------------------
+
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Lists receiving the records of finished stages while collect() is active
+_collectors = []
+# Open stages, innermost last: [name, peak bytes seen in already finished child stages]
+_stack = []
+
+
+@contextmanager
+def stage(name):
+    """Mark a phase of a script; records its wall and CPU time (and tracemalloc peak, if tracing).
+
+    A record holds the stage name, its path of enclosing stages ('load/load_washington'), the
+    start as epoch seconds, seconds, cpu_seconds (whole process), peak_bytes (None unless
+    tracemalloc is tracing), pid and tid.
+    """
+    if not _collectors:
+        yield
+        return
+
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        # reset_peak() is global, so hand the peak reached so far over to the enclosing stage first
+        if _stack:
+            _stack[-1][1] = max(_stack[-1][1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    frame = [name, 0]
+    _stack.append(frame)
+    started = time.time()
+    start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        cpu_seconds = time.process_time() - cpu_start
+        _stack.pop()
+        peak = max(frame[1], tracemalloc.get_traced_memory()[1]) if tracing else None
+        if tracing and _stack:
+            _stack[-1][1] = max(_stack[-1][1], peak)
+        record = {
+            "stage": name,
+            "path": "/".join([parent[0] for parent in _stack] + [name]),
+            "start": started,
+            "seconds": seconds,
+            "cpu_seconds": cpu_seconds,
+            "peak_bytes": peak,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        for records in _collectors:
+            records.append(record)
+
+
+def traced(name=None):
+    """Decorator running the function as a stage (named after the function by default)."""
+    def decorate(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def collect():
+    """Collect the records of every stage finished inside the block into the yielded list."""
+    records = []
+    _collectors.append(records)
+    try:
+        yield records
+    finally:
+        _collectors.remove(records)
+
+
+def summarize(records):
+    """Total seconds and CPU seconds, number of calls and highest peak per top-level stage name."""
+    summary = {}
+    for record in records:
+        if "/" in record["path"]:
+            continue  # nested stages are already contained in their parent's time
+        entry = summary.setdefault(record["stage"], {"seconds": 0.0, "cpu_seconds": 0.0, "calls": 0, "peak_bytes": None})
+        entry["seconds"] += record["seconds"]
+        entry["cpu_seconds"] += record["cpu_seconds"]
+        entry["calls"] += 1
+        if record["peak_bytes"] is not None:
+            entry["peak_bytes"] = max(entry["peak_bytes"] or 0, record["peak_bytes"])
+    return summary
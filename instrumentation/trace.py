@@ -0,0 +1,70 @@
+# ---------------------------------------------------------
+# Trace Output
+# Writes the stage records collected by generate_all_plots.py --trace as JSON lines (one object per
+# hypothesis and per stage) or in the Chrome trace event format, which chrome://tracing and
+# https://ui.perfetto.dev open as a timeline with one track per worker process.
+# ---------------------------------------------------------
+
+import json
+
+TRACE_FORMATS = ("jsonl", "chrome")
+
+
+def trace_format(path, fmt=None):
+    """Explicit `fmt`, otherwise 'chrome' for .json files and 'jsonl' for anything else."""
+    if fmt is not None:
+        return fmt
+    return "chrome" if path.lower().endswith(".json") else "jsonl"
+
+
+def trace_rows(results):
+    """One row per hypothesis run followed by one row per recorded stage of that run."""
+    rows = []
+    for result in results:
+        rows.append({
+            "type": "hypothesis",
+            "hypothesis": result["label"],
+            "module": result["module"],
+            "start": result["started"],
+            "seconds": result["seconds"],
+            "cpu_seconds": result["cpu_seconds"],
+            "failed": result["error"] is not None,
+        })
+        for record in result.get("trace", ()):
+            rows.append(dict(type="stage", hypothesis=result["label"], **record))
+    return rows
+
+
+def _chrome_events(results):
+    events = []
+    for result in results:
+        trace = result.get("trace", [])
+        pid = trace[0]["pid"] if trace else 0
+        tid = trace[0]["tid"] if trace else 0
+        events.append({
+            "name": result["label"], "cat": "hypothesis", "ph": "X", "pid": pid, "tid": tid,
+            "ts": result["started"] * 1e6, "dur": result["seconds"] * 1e6,
+            "args": {"module": result["module"], "cpu_seconds": result["cpu_seconds"],
+                     "failed": result["error"] is not None},
+        })
+        for record in trace:
+            events.append({
+                "name": record["stage"], "cat": "stage", "ph": "X", "pid": record["pid"], "tid": record["tid"],
+                "ts": record["start"] * 1e6, "dur": record["seconds"] * 1e6,
+                "args": {"path": record["path"], "cpu_seconds": record["cpu_seconds"],
+                         "peak_bytes": record["peak_bytes"]},
+            })
+    return events
+
+
+def write_trace(results, path, fmt=None):
+    """Write the traces of `results` (run_hypothesis dicts) to `path` in the given format."""
+    fmt = trace_format(path, fmt)
+    with open(path, "w", encoding="utf-8") as f:
+        if fmt == "chrome":
+            json.dump({"traceEvents": _chrome_events(results), "displayTimeUnit": "ms"}, f)
+        elif fmt == "jsonl":
+            for row in trace_rows(results):
+                f.write(json.dumps(row) + "\n")
+        else:
+            raise ValueError(f"unknown trace format '{fmt}' (expected one of {', '.join(TRACE_FORMATS)})")
@@ -0,0 +1,55 @@
+# ---------------------------------------------------------
+# Box Plots of Precomputed Statistics
+# Draws the box statistics of stats/quantiles.py through matplotlib's Axes.bxp, styled like
+# seaborn's boxplot (desaturated fill, gray lines, one box per category at 0, 1, ...), so the
+# charts no longer need the raw values of every group in memory.
+# ---------------------------------------------------------
+
+from colorsys import rgb_to_hls
+
+import matplotlib.colors as mcolors
+from seaborn.utils import desaturate
+
+from plotting.rendering import plt  # pyplot, imported once the backend is chosen
+
+# seaborn's defaults for categorical plots
+BOX_WIDTH = 0.8
+SATURATION = 0.75
+
+
+def draw_boxplot(stats, ax=None, color=None, palette=None, showmeans=False, meanprops=None,
+                 xlabel=None, ylabel=None, width=BOX_WIDTH, saturation=SATURATION):
+    """One box per entry of `stats` (dicts with a 'label', see stats.quantiles.group_box_stats).
+
+    `palette` maps labels to box colors; otherwise every box gets `color` (default: the first
+    color of the property cycle). Returns the Axes.
+    """
+    ax = plt.gca() if ax is None else ax
+    if color is None:
+        color = plt.rcParams["axes.prop_cycle"].by_key()["color"][0]
+    colors = [desaturate(palette[box["label"]] if palette else color, saturation) for box in stats]
+    # Line color like seaborn's "auto": a gray at 60% of the lightness of the darkest fill
+    lightness = min((rgb_to_hls(*mcolors.to_rgb(c))[1] for c in colors), default=0.5) * 0.6
+    linecolor = (lightness, lightness, lightness)
+
+    positions = list(range(len(stats)))
+    artists = ax.bxp(
+        stats, positions=positions, widths=width, capwidths=width / 2, patch_artist=True,
+        showmeans=showmeans, meanprops=meanprops, manage_ticks=False,
+        boxprops={"edgecolor": linecolor},
+        medianprops={"color": linecolor, "solid_capstyle": "butt"},
+        whiskerprops={"color": linecolor, "solid_capstyle": "butt"},
+        capprops={"color": linecolor},
+        flierprops={"markeredgecolor": linecolor},
+    )
+    for box, fill in zip(artists["boxes"], colors):
+        box.set_facecolor(fill)
+
+    ax.set_xticks(positions, [str(box["label"]) for box in stats])
+    ax.set_xlim(-0.5, len(stats) - 0.5)
+    ax.xaxis.grid(False)
+    if xlabel is not None:
+        ax.set_xlabel(xlabel)
+    if ylabel is not None:
+        ax.set_ylabel(ylabel)
+    return ax
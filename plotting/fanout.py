@@ -0,0 +1,71 @@
+# ---------------------------------------------------------
+# Parallel Rendering of Chart Loops
+# Per-industry / per-sensitivity loops draw many independent charts. Each chart becomes a RenderTask:
+# its output path, a module-level draw function and only the pre-aggregated slice it shows. Tasks
+# run on a process pool (one reused figure per worker) and the output paths are recorded in the
+# calling process, so the build manifest sees them. Interactive sessions and small loops render
+# serially in-process, where figures can be shown.
+# ---------------------------------------------------------
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from instrumentation.stages import traced
+from plotting.rendering import figure, is_interactive, record_output, shared_figure
+
+# Loops with fewer charts render serially: starting the workers would cost more than it saves
+PARALLEL_MIN_TASKS = 8
+
+# Figure number reused by the charts rendered in one process
+FANOUT_FIGURE = "fanout"
+
+# Render processes a loop may use (default: all CPUs). Runners that already run several
+# hypotheses in parallel set it to their share of the CPUs, so the pools do not oversubscribe them.
+RENDER_JOBS_ENV = "BREACH_RENDER_JOBS"
+
+
+class RenderTask:
+    """One chart: draw(**data) into a figure saved to `path`.
+
+    `draw` must be a module-level function and `data` picklable, so the task can run in a worker.
+    """
+
+    def __init__(self, path, draw, data, figsize=None, **savefig_kwargs):
+        self.path = path
+        self.draw = draw
+        self.data = data
+        self.figsize = figsize
+        self.savefig_kwargs = savefig_kwargs
+
+
+def _render(task, num=FANOUT_FIGURE):
+    with figure(task.path, figsize=task.figsize, num=num, **task.savefig_kwargs):
+        task.draw(**task.data)
+    return task.path
+
+
+def _init_worker():
+    # Workers never have a display to draw on
+    import matplotlib
+
+    os.environ["MPLBACKEND"] = "Agg"
+    matplotlib.use("Agg")
+
+
+@traced()
+def render_all(tasks, jobs=None):
+    """Render `tasks` on `jobs` processes (default: $BREACH_RENDER_JOBS or all CPUs); returns their paths in task order."""
+    tasks = list(tasks)
+    jobs = jobs or int(os.environ.get(RENDER_JOBS_ENV) or 0) or os.cpu_count() or 1
+    jobs = min(jobs, len(tasks))
+    if jobs <= 1 or len(tasks) < PARALLEL_MIN_TASKS or is_interactive():
+        with shared_figure(FANOUT_FIGURE) as num:
+            return [_render(task, num) for task in tasks]
+
+    # Contiguous batches per worker keep the task order and amortize the pickling
+    chunksize = max(1, len(tasks) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as pool:
+        paths = list(pool.map(_render, tasks, chunksize=chunksize))
+    for path in paths:
+        record_output(path)
+    return paths
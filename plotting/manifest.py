@@ -0,0 +1,99 @@
+# ---------------------------------------------------------
+# Incremental Build Manifest
+# Records, for every generated artifact, the hash of the input columns it was computed from and the
+# version (source hash) of the script that produced it, so generate_all_plots.py only reruns the
+# hypotheses whose data or code changed, or whose outputs are missing.
+# ---------------------------------------------------------
+
+import ast
+import datetime
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MANIFEST_PATH = os.path.join(ROOT, ".build_manifest.json")
+
+# Repo-local packages whose source counts towards a script's version
+LOCAL_PACKAGES = {"data", "stats", "plotting", "instrumentation", "Hypothesis1", "Hypothesis2", "Hypothesis3", "Hypothesis4"}
+
+
+def _module_path(module_name):
+    path = os.path.join(ROOT, *module_name.split(".")) + ".py"
+    return path if os.path.exists(path) else None
+
+
+def _local_imports(path):
+    """Repo-local modules imported by the file at `path`."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            names.add(node.module)
+            names.update(f"{node.module}.{alias.name}" for alias in node.names)
+        elif isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+    return {name for name in names if name.split(".")[0] in LOCAL_PACKAGES and _module_path(name)}
+
+
+def source_version(module_name):
+    """Hash of the source of `module_name` and of every repo-local module it (transitively) imports."""
+    seen, pending = set(), [module_name]
+    while pending:
+        name = pending.pop()
+        if name not in seen:
+            seen.add(name)
+            pending.extend(_local_imports(_module_path(name)))
+    digest = hashlib.sha256()
+    for name in sorted(seen):
+        with open(_module_path(name), "rb") as f:
+            digest.update(name.encode() + b"\0" + f.read())
+    return digest.hexdigest()
+
+
+def input_hash(inputs):
+    """Hash of the input columns, given as {dataset: [columns] or None for every column}."""
+    from data.loader import load_kaggle, load_washington
+
+    loaders = {"washington": load_washington, "kaggle": load_kaggle}
+    digest = hashlib.sha256()
+    for dataset in sorted(inputs):
+        df = loaders[dataset](columns=inputs[dataset])
+        digest.update(json.dumps([dataset, list(df.columns)]).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"artifacts": {}}
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def is_up_to_date(manifest, producer, version, inputs):
+    """True if `producer` has built artifacts before and all of them exist with matching hashes."""
+    artifacts = [(path, entry) for path, entry in manifest["artifacts"].items() if entry["producer"] == producer]
+    return bool(artifacts) and all(
+        entry["version"] == version and entry["inputs"] == inputs and os.path.exists(os.path.join(ROOT, path))
+        for path, entry in artifacts
+    )
+
+
+def record_build(manifest, producer, version, inputs, outputs):
+    """Replace the artifacts of `producer` by `outputs` (paths relative to the project root)."""
+    built = datetime.datetime.now().isoformat(timespec="seconds")
+    artifacts = {path: entry for path, entry in manifest["artifacts"].items() if entry["producer"] != producer}
+    for path in outputs:
+        artifacts[path.replace(os.sep, "/")] = {"producer": producer, "version": version, "inputs": inputs, "built": built}
+    manifest["artifacts"] = artifacts
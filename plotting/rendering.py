@@ -0,0 +1,95 @@
+# ---------------------------------------------------------
+# Rendering Helpers
+# Selects a non-interactive backend on machines without a display and wraps every chart in a
+# context manager that saves it, shows it when running interactively and then clears or closes it,
+# so batch runs need no X server and memory stays flat in per-industry/per-sensitivity loops.
+# ---------------------------------------------------------
+
+import os
+import sys
+from contextlib import contextmanager
+
+import matplotlib
+
+from instrumentation.stages import stage
+
+NON_INTERACTIVE_BACKENDS = {"agg", "cairo", "pdf", "pgf", "ps", "svg", "template"}
+
+
+def is_headless():
+    """True on Linux/BSD machines without an X11 or Wayland display."""
+    if sys.platform.startswith(("linux", "freebsd", "openbsd")):
+        return not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+    return False
+
+
+def configure_backend():
+    """Use Agg when headless, unless a backend was requested explicitly through MPLBACKEND."""
+    if not os.environ.get("MPLBACKEND") and is_headless():
+        matplotlib.use("Agg")
+
+
+configure_backend()
+import matplotlib.pyplot as plt  # noqa: E402 (after the backend is chosen)
+
+
+def is_interactive():
+    return matplotlib.get_backend().lower() not in NON_INTERACTIVE_BACKENDS
+
+
+# Paths of all artifacts written since the last reset (read by the incremental build)
+_outputs = []
+
+
+def record_output(path):
+    """Register a generated artifact that was not written through save_figure (e.g. Graphviz)."""
+    _outputs.append(os.path.normpath(path))
+    return path
+
+
+def recorded_outputs(reset=False):
+    outputs = list(dict.fromkeys(_outputs))
+    if reset:
+        _outputs.clear()
+    return outputs
+
+
+def save_figure(fig, path, **savefig_kwargs):
+    """Save `fig` to `path`, creating the output directory if needed."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with stage("savefig"):
+        fig.savefig(path, **savefig_kwargs)
+    record_output(path)
+
+
+@contextmanager
+def figure(path=None, figsize=None, num=None, **savefig_kwargs):
+    """Current figure for one chart: saved to `path` and shown (if interactive) on exit.
+
+    Without `num` the figure is closed on exit. With `num` (see shared_figure) the same figure
+    is cleared and reused by every chart drawn under that number instead of allocating a new one.
+    """
+    with stage("render"):
+        fig = plt.figure(num=num, figsize=figsize, clear=num is not None)
+        if figsize is not None:
+            fig.set_size_inches(figsize)  # a reused figure keeps the size of its previous chart otherwise
+        try:
+            yield fig
+            if path is not None:
+                save_figure(fig, path, **savefig_kwargs)
+            if is_interactive():
+                plt.show()
+        finally:
+            if num is None:
+                plt.close(fig)
+
+
+@contextmanager
+def shared_figure(num):
+    """Figure number to reuse across the charts of a plotting loop; the figure is closed afterwards."""
+    try:
+        yield num
+    finally:
+        plt.close(num)
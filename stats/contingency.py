@@ -0,0 +1,128 @@
+# ---------------------------------------------------------
+# Incremental Contingency Tables
+# Keeps the (row label x column label) counts of two categorical variables and derives the
+# chi-square test, Cramér's V and the row-normalized shares from those counts alone. New batches of
+# rows are counted with one bincount and added to the table, so refreshing the statistics on a
+# growing feed costs O(new rows); tables can be saved to and loaded from JSON between runs.
+# ---------------------------------------------------------
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2_contingency
+
+from instrumentation.stages import traced
+
+
+def _labels(values):
+    """(codes, sorted labels) of `values`; missing values get code -1."""
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes, pd.Index(np.asarray(uniques), name=getattr(values, "name", None))
+
+
+class ContingencyTable:
+    """Counts of (row, column) label pairs, with labels kept sorted like pd.crosstab's.
+
+    Attributes:
+        counts: (row labels x column labels) DataFrame of int64 counts.
+    """
+
+    def __init__(self, row=None, column=None, counts=None):
+        if counts is None:
+            counts = pd.DataFrame(
+                np.zeros((0, 0), dtype=np.int64),
+                index=pd.Index([], name=row), columns=pd.Index([], name=column),
+            )
+        counts = counts.astype(np.int64)
+        # Plain (not categorical) labels, so tables with different label sets can be added
+        counts.index = pd.Index(np.asarray(counts.index), name=counts.index.name if row is None else row)
+        counts.columns = pd.Index(np.asarray(counts.columns), name=counts.columns.name if column is None else column)
+        self.counts = counts
+        self.row, self.column = counts.index.name, counts.columns.name
+
+    @classmethod
+    def from_cube(cls, cube, row, column):
+        """Table of the `row` x `column` row counts of an AggregateCube (see data/cube.py)."""
+        return cls(row, column, cube.table(row, column))
+
+    @classmethod
+    def from_frame(cls, df, row, column):
+        """Table of the `row` x `column` pairs of `df` (rows missing either label are skipped)."""
+        return cls(row, column).update(df)
+
+    @traced("contingency_update")
+    def update(self, df):
+        """Add the label pairs of the rows of `df` to the counts; returns the table itself."""
+        row_codes, row_labels = _labels(df[self.row])
+        column_codes, column_labels = _labels(df[self.column])
+        keep = (row_codes >= 0) & (column_codes >= 0)
+        flat = row_codes[keep] * len(column_labels) + column_codes[keep]
+        batch = np.bincount(flat, minlength=len(row_labels) * len(column_labels))
+        batch = pd.DataFrame(
+            batch.reshape(len(row_labels), len(column_labels)), index=row_labels, columns=column_labels,
+        )
+
+        if self.counts.empty:
+            counts = batch
+        else:
+            # Cells missing from both tables (new row x new column label) stay NaN under add(), hence fillna
+            counts = self.counts.add(batch, fill_value=0).fillna(0)
+            counts = counts.sort_index().sort_index(axis=1)  # new labels may arrive in any order
+        counts.index.name, counts.columns.name = self.row, self.column
+        self.counts = counts.astype(np.int64)
+        return self
+
+    @property
+    def total(self):
+        return int(self.counts.to_numpy().sum())
+
+    def observed(self):
+        """Counts without all-zero rows and columns (these carry no information for the tests)."""
+        counts = self.counts
+        return counts.loc[counts.sum(axis=1) > 0, counts.sum(axis=0) > 0]
+
+    def chi2(self):
+        """Pearson chi-square test of independence: (statistic, p-value, dof, expected counts)."""
+        return chi2_contingency(self.observed())
+
+    def cramers_v(self, chi2=None):
+        """Cramér's V, from `chi2` if the test statistic is already at hand."""
+        observed = self.observed()
+        chi2 = chi2_contingency(observed)[0] if chi2 is None else chi2
+        min_dim = min(observed.shape) - 1
+        return np.sqrt(chi2 / (self.total * min_dim)) if min_dim > 0 else np.nan
+
+    def row_shares(self):
+        """Share of every column within its row; equivalent to pd.crosstab(..., normalize='index')."""
+        observed = self.observed()
+        return observed.div(observed.sum(axis=1), axis=0)
+
+    def to_dict(self):
+        return {
+            "row": self.row,
+            "column": self.column,
+            "rows": self.counts.index.tolist(),
+            "columns": self.counts.columns.tolist(),
+            "counts": self.counts.to_numpy().tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        counts = pd.DataFrame(
+            np.array(data["counts"], dtype=np.int64).reshape(len(data["rows"]), len(data["columns"])),
+            index=pd.Index(data["rows"], name=data["row"]),
+            columns=pd.Index(data["columns"], name=data["column"]),
+        )
+        return cls(data["row"], data["column"], counts)
+
+    def save(self, path):
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,105 @@
+# ---------------------------------------------------------
+# Rank-Once Nonparametric Group Comparisons
+# Ranks the pooled values a single time (average ranks for ties) and derives both the Kruskal-Wallis H
+# and the Mann-Whitney U of every pair of groups from that one sort, instead of re-sorting per pair.
+# Intended for heavily skewed measures such as WashingtoniansAffected and records lost.
+# ---------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy import stats as st
+
+from instrumentation.stages import traced
+from stats.pairwise import PairwiseResult
+
+
+class RankedGroups:
+    """Pooled values of all groups, sorted once and split into blocks of tied values.
+
+    Attributes:
+        groups: Index of group labels in order of appearance.
+        codes: group code of each pooled observation, in sorted order.
+        blocks: tie-block id of each observation, in sorted order.
+        ranks: average rank of each observation, in sorted order.
+        counts: (groups x tie blocks) sparse matrix of observation counts.
+    """
+
+    def __init__(self, df, group_col, value_col):
+        data = df.dropna(subset=[group_col, value_col])
+        codes, self.groups = pd.factorize(data[group_col])
+        values = data[value_col].to_numpy(dtype=float)
+
+        order = np.argsort(values, kind="mergesort")
+        values = values[order]
+        self.codes = codes[order]
+
+        new_block = np.empty(len(values), dtype=bool)
+        new_block[:1] = True
+        np.not_equal(values[1:], values[:-1], out=new_block[1:])
+        self.blocks = np.cumsum(new_block) - 1
+        starts = np.flatnonzero(new_block)
+        self.block_sizes = np.diff(np.append(starts, len(values)))
+        self.ranks = (starts + (self.block_sizes + 1) / 2)[self.blocks]
+
+        self.n = np.bincount(self.codes, minlength=len(self.groups)).astype(float)
+        self.counts = sparse.csr_matrix(
+            (np.ones(len(values)), (self.codes, self.blocks)),
+            shape=(len(self.groups), len(starts)),
+        )
+
+    @property
+    def total(self):
+        return len(self.codes)
+
+
+def kruskal_wallis(ranked):
+    """Kruskal-Wallis H-test with tie correction; equivalent to scipy's kruskal."""
+    n, total = ranked.n[ranked.n > 0], ranked.total
+    rank_sums = np.bincount(ranked.codes, weights=ranked.ranks, minlength=len(ranked.groups))[ranked.n > 0]
+
+    h = 12.0 / (total * (total + 1)) * (rank_sums ** 2 / n).sum() - 3 * (total + 1)
+    ties = ranked.block_sizes.astype(float)
+    h /= 1 - (ties ** 3 - ties).sum() / (total ** 3 - total)
+    return h, st.chi2.sf(h, len(n) - 1)
+
+
+def mann_whitney_pairwise(ranked, method="bonferroni", alpha=0.05):
+    """Two-sided Mann-Whitney U test between every pair of groups, corrected for multiple testing.
+
+    Uses the normal approximation with tie and continuity correction (scipy's method='asymptotic').
+    The statistic matrix holds U of the row group against the column group.
+    """
+    n_groups = len(ranked.groups)
+
+    # u[a, b] = #(x in a, y in b with y < x) + 0.5 * #ties, one O(N) pass per column group
+    u = np.empty((n_groups, n_groups))
+    for b in range(n_groups):
+        per_block = ranked.counts[b].toarray().ravel()
+        mid_below = (np.cumsum(per_block) - per_block / 2)[ranked.blocks]
+        u[:, b] = np.bincount(ranked.codes, weights=mid_below, minlength=n_groups)
+
+    # Sum over tie blocks of (t^3 - t) within each pair, t = c_a + c_b
+    counts = ranked.counts
+    cubes = np.asarray(counts.power(3).sum(axis=1)).ravel()
+    cross = (counts.power(2) @ counts.T).toarray()  # sum_k c_a^2 * c_b
+    ties = cubes[:, None] + cubes[None, :] + 3 * (cross + cross.T) - ranked.n[:, None] - ranked.n[None, :]
+
+    n_a, n_b = ranked.n[:, None], ranked.n[None, :]
+    pooled = n_a + n_b
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma = np.sqrt(n_a * n_b / 12 * ((pooled + 1) - ties / (pooled * (pooled - 1))))
+        z = (np.maximum(u, u.T) - n_a * n_b / 2 - 0.5) / sigma
+        p = np.clip(2 * st.norm.sf(z), 0, 1)
+    p[(n_a == 0) | (n_b == 0) | (sigma == 0)] = np.nan
+    np.fill_diagonal(p, np.nan)
+
+    return PairwiseResult(ranked.groups, u, p, method=method, alpha=alpha)
+
+
+@traced()
+def nonparametric_tests(df, group_col, value_col, method="bonferroni", alpha=0.05):
+    """Kruskal-Wallis (H, p) and all-pairs Mann-Whitney results from a single ranking."""
+    ranked = RankedGroups(df, group_col, value_col)
+    h, p = kruskal_wallis(ranked)
+    return h, p, mann_whitney_pairwise(ranked, method=method, alpha=alpha)
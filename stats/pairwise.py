@@ -0,0 +1,112 @@
+# ---------------------------------------------------------
+# Vectorized Pairwise Group Comparisons
+# Computes per-group n, mean and variance in a single groupby and derives the Welch t-statistic,
+# degrees of freedom and p-value of every pair of groups as NumPy matrices, with the multiple-testing
+# correction applied to all pairs at once. Also provides the one-way ANOVA from the same moments.
+# ---------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+from scipy import stats as st
+from statsmodels.stats.multitest import multipletests
+
+from instrumentation.stages import traced
+
+
+class PairwiseResult:
+    """Symmetric (groups x groups) test results with a bulk multiple-testing correction.
+
+    Pairs are ordered like itertools.combinations(groups, 2). Pairs without a finite p-value
+    (e.g. a group with fewer than two observations) are left out of the correction.
+    """
+
+    def __init__(self, groups, statistic, pvalues, method="bonferroni", alpha=0.05):
+        self.groups = pd.Index(groups)
+        self.statistic = statistic
+        self.pvalues = pvalues
+        self.method = method
+        self.alpha = alpha
+
+        self.pvalues_corrected = np.full_like(pvalues, np.nan, dtype=float)
+        self.reject = np.zeros(pvalues.shape, dtype=bool)
+        rows, cols = np.triu_indices(len(self.groups), k=1)
+        finite = np.isfinite(pvalues[rows, cols])
+        if finite.any():
+            reject, corrected, _, _ = multipletests(pvalues[rows, cols][finite], alpha=alpha, method=method)
+            r, c = rows[finite], cols[finite]
+            self.pvalues_corrected[r, c] = self.pvalues_corrected[c, r] = corrected
+            self.reject[r, c] = self.reject[c, r] = reject
+
+    def pairs(self):
+        """Yield (group_a, group_b, corrected p-value, reject) for every pair."""
+        rows, cols = np.triu_indices(len(self.groups), k=1)
+        for i, j in zip(rows, cols):
+            yield self.groups[i], self.groups[j], self.pvalues_corrected[i, j], self.reject[i, j]
+
+    def significance_matrix(self):
+        """Corrected p-values as a labelled DataFrame."""
+        return pd.DataFrame(self.pvalues_corrected, index=self.groups, columns=self.groups)
+
+    def to_frame(self):
+        rows, cols = np.triu_indices(len(self.groups), k=1)
+        return pd.DataFrame({
+            "group_a": self.groups[rows],
+            "group_b": self.groups[cols],
+            "statistic": self.statistic[rows, cols],
+            "p": self.pvalues[rows, cols],
+            "p_corrected": self.pvalues_corrected[rows, cols],
+            "reject": self.reject[rows, cols],
+        })
+
+
+@traced()
+def group_moments(df, group_col, value_col):
+    """Count, mean and sample variance of `value_col` per group, groups in order of appearance."""
+    groups = df[group_col].dropna().unique()
+    moments = (
+        df.dropna(subset=[value_col])
+        .groupby(group_col, sort=False, observed=True)[value_col]
+        .agg(["count", "mean", "var"])
+    )
+    return moments.reindex(groups).fillna({"count": 0})
+
+
+@traced()
+def welch_from_moments(moments, method="bonferroni", alpha=0.05):
+    """All-pairs Welch t-test from a DataFrame with 'count', 'mean' and 'var' columns."""
+    n = moments["count"].to_numpy(dtype=float)
+    mean = moments["mean"].to_numpy(dtype=float)
+    se2 = moments["var"].to_numpy(dtype=float) / n
+    se2[n < 2] = np.nan
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sum_se2 = se2[:, None] + se2[None, :]
+        t = (mean[:, None] - mean[None, :]) / np.sqrt(sum_se2)
+        dof = sum_se2 ** 2 / ((se2 ** 2 / (n - 1))[:, None] + (se2 ** 2 / (n - 1))[None, :])
+        p = 2 * st.t.sf(np.abs(t), dof)
+
+    result = PairwiseResult(moments.index, t, p, method=method, alpha=alpha)
+    result.dof = dof
+    result.moments = moments
+    return result
+
+
+def welch_pairwise(df, group_col, value_col, method="bonferroni", alpha=0.05):
+    """Welch's t-test between every pair of groups, corrected for multiple testing."""
+    return welch_from_moments(group_moments(df, group_col, value_col), method=method, alpha=alpha)
+
+
+@traced()
+def anova_from_moments(moments):
+    """One-way ANOVA (F, p) from per-group count/mean/var; equivalent to scipy's f_oneway."""
+    moments = moments[moments["count"] > 0]
+    n = moments["count"].to_numpy(dtype=float)
+    mean = moments["mean"].to_numpy(dtype=float)
+    var = moments["var"].fillna(0).to_numpy(dtype=float)
+
+    k, total = len(n), n.sum()
+    grand_mean = (n * mean).sum() / total
+    between = (n * (mean - grand_mean) ** 2).sum() / (k - 1)
+    within = ((n - 1) * var).sum() / (total - k)
+    f_stat = between / within
+    return f_stat, st.f.sf(f_stat, k - 1, total - k)
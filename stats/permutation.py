@@ -0,0 +1,140 @@
+# ---------------------------------------------------------
+# Permutation Chi-Square Test
+# For sparse contingency tables (many cells with expected counts below 5) the asymptotic chi-square
+# p-value is unreliable. This test rebuilds the rows behind a count table as two int-coded label
+# arrays and shuffles the column labels: each NumPy call permutes a whole batch of label arrays and
+# counts all of them with one bincount. Batches run on a process pool, each with its own
+# SeedSequence child, and sampling stops once the confidence interval of the p-value is tight enough.
+# ---------------------------------------------------------
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import beta
+
+from instrumentation.stages import traced
+
+# Upper bound for the number of label cells (permutations x rows) shuffled per NumPy call
+BATCH_CELLS = 1 << 22
+
+# Relative tolerance when comparing permuted statistics with the observed one (float round-off)
+TIE_TOLERANCE = 1e-9
+
+
+class PermutationResult:
+    """Outcome of a permutation test.
+
+    Attributes:
+        statistic: observed chi-square statistic.
+        pvalue: (exceedances + 1) / (permutations + 1), never 0.
+        ci: Clopper-Pearson confidence interval of the exact p-value.
+        permutations: number of permutations drawn.
+        exceedances: permutations with a statistic at least as large as the observed one.
+        stopped_early: True if the interval became tight enough before all permutations ran.
+    """
+
+    def __init__(self, statistic, exceedances, permutations, confidence, stopped_early):
+        self.statistic = statistic
+        self.exceedances = exceedances
+        self.permutations = permutations
+        self.confidence = confidence
+        self.stopped_early = stopped_early
+        self.pvalue = (exceedances + 1) / (permutations + 1)
+        self.ci = clopper_pearson(exceedances, permutations, confidence)
+
+    def __repr__(self):
+        low, high = self.ci
+        return (f"PermutationResult(statistic={self.statistic:.2f}, pvalue={self.pvalue:.6f}, "
+                f"ci=({low:.6f}, {high:.6f}), permutations={self.permutations})")
+
+
+def clopper_pearson(successes, trials, confidence=0.99):
+    """Exact binomial confidence interval of a proportion."""
+    tail = (1 - confidence) / 2
+    low = beta.ppf(tail, successes, trials - successes + 1) if successes > 0 else 0.0
+    high = beta.ppf(1 - tail, successes + 1, trials - successes) if successes < trials else 1.0
+    return float(low), float(high)
+
+
+def expand_counts(counts):
+    """(row codes, column codes) of the observations behind a (rows x columns) count matrix."""
+    counts = np.asarray(counts, dtype=np.int64)
+    n_rows, n_columns = counts.shape
+    cells = np.arange(n_rows * n_columns)
+    observations = np.repeat(cells, counts.ravel())
+    return observations // n_columns, observations % n_columns
+
+
+def chi2_statistic(counts, expected):
+    """Pearson chi-square statistic of one or more count tables (..., rows, columns)."""
+    return (counts ** 2 / expected).sum(axis=(-2, -1)) - expected.sum()
+
+
+def _exceedances(row_codes, column_codes, shape, threshold, permutations, seed):
+    """Number of `permutations` of the column labels whose statistic reaches `threshold`."""
+    rng = np.random.default_rng(seed)
+    n_rows, n_columns = shape
+    n_cells = n_rows * n_columns
+    expected = np.outer(np.bincount(row_codes, minlength=n_rows), np.bincount(column_codes, minlength=n_columns))
+    expected = expected / len(row_codes)
+
+    # Row codes are fixed: precompute their cell offsets once, then shuffle only the columns
+    row_offsets = (row_codes * n_columns).astype(np.int64)
+    batch = max(1, min(permutations, BATCH_CELLS // max(len(row_codes), 1)))
+    found = 0
+    for start in range(0, permutations, batch):
+        size = min(batch, permutations - start)
+        shuffled = rng.permuted(np.broadcast_to(column_codes, (size, len(column_codes))), axis=1)
+        flat = shuffled + row_offsets + (np.arange(size) * n_cells)[:, None]
+        counts = np.bincount(flat.ravel(), minlength=size * n_cells).reshape(size, n_rows, n_columns)
+        found += int(np.count_nonzero(chi2_statistic(counts, expected) >= threshold))
+    return found
+
+
+@traced()
+def permutation_chi2(counts, permutations=20000, batch_permutations=2000, tolerance=0.001,
+                     confidence=0.99, jobs=None, seed=0):
+    """Permutation test of independence for a (rows x columns) table of counts.
+
+    The permutations are split into batches of `batch_permutations`, each seeded with its own
+    child of SeedSequence(seed) and handed to a pool of `jobs` processes (default: all CPUs;
+    1 runs in-process). Batches are consumed in order, so the result only depends on `seed`.
+    Sampling stops early once the half-width of the `confidence` interval of the p-value is at
+    most `tolerance`. All-zero rows and columns are ignored.
+    """
+    counts = counts.to_numpy() if isinstance(counts, pd.DataFrame) else np.asarray(counts)
+    counts = counts[counts.sum(axis=1) > 0][:, counts.sum(axis=0) > 0].astype(np.int64)
+    row_codes, column_codes = expand_counts(counts)
+    expected = np.outer(counts.sum(axis=1), counts.sum(axis=0)) / counts.sum()
+    statistic = float(chi2_statistic(counts, expected))
+    threshold = statistic * (1 - TIE_TOLERANCE)
+
+    sizes = [min(batch_permutations, permutations - start) for start in range(0, permutations, batch_permutations)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(row_codes, column_codes, counts.shape, threshold, size, child) for size, child in zip(sizes, seeds)]
+
+    jobs = min(jobs or os.cpu_count() or 1, len(sizes))
+    found = drawn = 0
+    stopped_early = False
+    pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    try:
+        # Keep at most `jobs` batches in flight, so stopping early does not waste queued work
+        pending = []
+        for index in range(len(args)):
+            while len(pending) < jobs and index + len(pending) < len(args):
+                task = args[index + len(pending)]
+                pending.append(pool.submit(_exceedances, *task) if pool else task)
+            head = pending.pop(0)
+            found += head.result() if pool else _exceedances(*head)
+            drawn += sizes[index]
+
+            low, high = clopper_pearson(found, drawn, confidence)
+            if (high - low) / 2 <= tolerance and drawn < permutations:
+                stopped_early = True
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return PermutationResult(statistic, found, drawn, confidence, stopped_early)
@@ -0,0 +1,285 @@
+# ---------------------------------------------------------
+# Box Plot Statistics per Group
+# A box plot only needs a few numbers per group: the quartiles, the whisker ends, the mean and the
+# points beyond the whiskers. Small inputs get them exactly (same definitions as matplotlib's
+# boxplot_stats). Large inputs, or feeds read in chunks, are summarized by a BoxSketch: value counts
+# in logarithmic buckets (quantiles within a fixed relative error) plus the count, sum and the
+# smallest and largest values seen. Sketches of chunks merge by adding bucket counts, so memory
+# depends on the range of the values and not on the number of rows. The results feed straight into
+# matplotlib's Axes.bxp (see plotting/boxplot.py).
+# ---------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+from matplotlib.cbook import boxplot_stats
+
+from instrumentation.stages import traced
+
+# Relative error of the quantiles of a sketch (0.5%: well below a pixel on a log axis)
+RELATIVE_ACCURACY = 0.005
+
+# Outliers kept per side of a box (the most extreme ones); also the exact tails of a sketch
+MAX_FLIERS = 1000
+
+# Inputs up to this many rows are summarized exactly
+EXACT_LIMIT = 1_000_000
+
+# Rows per chunk when a large DataFrame is fed to the sketches
+CHUNK_ROWS = 1_000_000
+
+
+def _cap_fliers(fliers, low, high, max_fliers):
+    """The `max_fliers` most extreme outliers below `low` and above `high`."""
+    fliers = np.sort(np.asarray(fliers, dtype=float))
+    below, above = fliers[fliers < low], fliers[fliers > high]
+    return np.concatenate((below[:max_fliers], above[len(above) - min(len(above), max_fliers):]))
+
+
+def box_stats(values, whis=1.5, label=None, max_fliers=MAX_FLIERS):
+    """Exact box statistics of `values` (missing values ignored), as a dict for Axes.bxp.
+
+    None if there are no values.
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return None
+    stats = boxplot_stats(values, whis=whis, labels=None if label is None else [label])[0]
+    stats["fliers"] = _cap_fliers(stats["fliers"], stats["whislo"], stats["whishi"], max_fliers)
+    return stats
+
+
+class _Buckets:
+    """Counts of consecutive integer bucket indices, starting at `offset`."""
+
+    def __init__(self):
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def add(self, indices, counts=None):
+        if len(indices) == 0:
+            return
+        low, high = int(indices.min()), int(indices.max())
+        if len(self.counts):
+            low, high = min(low, self.offset), max(high, self.offset + len(self.counts) - 1)
+        grown = np.zeros(high - low + 1, dtype=np.int64)
+        grown[self.offset - low:self.offset - low + len(self.counts)] = self.counts
+        grown += np.bincount(indices - low, weights=counts, minlength=len(grown)).astype(np.int64)
+        self.offset, self.counts = low, grown
+
+    def merge(self, other):
+        self.add(np.arange(other.offset, other.offset + len(other.counts)), other.counts)
+
+    @property
+    def indices(self):
+        return np.arange(self.offset, self.offset + len(self.counts))
+
+
+class BoxSketch:
+    """Mergeable summary of a stream of values for box plots.
+
+    Positive and negative values are counted in buckets (gamma^(i-1), gamma^i] of their magnitude,
+    gamma = (1 + a) / (1 - a) for the relative accuracy a; the middle of a bucket is within a of
+    every value in it. The `tail` smallest and largest values are kept exactly: they give the
+    outliers, and every quantile while the sketch holds at most 2 * `tail` values is exact.
+
+    Attributes:
+        count, total, min, max: number, sum and extremes of the values seen.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY, tail=MAX_FLIERS):
+        self.relative_accuracy = relative_accuracy
+        self.tail = tail
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self._gamma)
+        self._positive, self._negative = _Buckets(), _Buckets()
+        self.zeros = 0
+        self.count, self.total = 0, 0.0
+        self.min, self.max = np.inf, -np.inf
+        self._low = np.zeros(0)   # `tail` smallest values, ascending
+        self._high = np.zeros(0)  # `tail` largest values, ascending
+
+    def _index(self, magnitudes):
+        return np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+
+    def _value(self, indices):
+        return 2 * self._gamma ** indices.astype(float) / (self._gamma + 1)
+
+    def _bucket_value(self, value):
+        """Middle of the bucket that `value` falls in."""
+        if value == 0:
+            return 0.0
+        return float(np.sign(value) * self._value(self._index(np.array([abs(value)])))[0])
+
+    def _keep_tails(self, low, high):
+        low = np.concatenate((self._low, low))
+        high = np.concatenate((self._high, high))
+        if len(low) > self.tail:
+            low = np.partition(low, self.tail - 1)[:self.tail]
+        if len(high) > self.tail:
+            high = np.partition(high, len(high) - self.tail)[len(high) - self.tail:]
+        self._low, self._high = np.sort(low), np.sort(high)
+
+    def update(self, values):
+        """Add `values` (missing values ignored); returns the sketch itself."""
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.min, self.max = min(self.min, values.min()), max(self.max, values.max())
+        positive, negative = values[values > 0], -values[values < 0]
+        self.zeros += len(values) - len(positive) - len(negative)
+        self._positive.add(self._index(positive))
+        self._negative.add(self._index(negative))
+        self._keep_tails(values, values)
+        return self
+
+    def merge(self, other):
+        """Add the values summarized by `other` (same accuracy); returns the sketch itself."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracies")
+        self.count += other.count
+        self.total += other.total
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        self.zeros += other.zeros
+        self._positive.merge(other._positive)
+        self._negative.merge(other._negative)
+        self._keep_tails(other._low, other._high)
+        return self
+
+    def _layout(self):
+        """(bucket values ascending, cumulative counts) over negatives, zero and positives."""
+        values = np.concatenate((
+            -self._value(self._negative.indices)[::-1], [0.0], self._value(self._positive.indices),
+        ))
+        counts = np.concatenate((self._negative.counts[::-1], [self.zeros], self._positive.counts))
+        return values, np.cumsum(counts)
+
+    def _order_statistics(self, ranks, layout):
+        """Values of 0-based ranks: exact within the kept tails, bucket values in between."""
+        ranks = np.asarray(ranks, dtype=np.int64)
+        values, cumulative = layout
+        result = np.clip(values[np.searchsorted(cumulative, ranks, side="right")], self.min, self.max)
+        from_low = ranks < len(self._low)
+        result[from_low] = self._low[ranks[from_low]]
+        from_top = self.count - 1 - ranks
+        from_high = ~from_low & (from_top < len(self._high))
+        result[from_high] = self._high[len(self._high) - 1 - from_top[from_high]]
+        return result
+
+    def quantiles(self, q, layout=None):
+        """Quantiles `q` with NumPy's default (linear) interpolation between order statistics."""
+        layout = self._layout() if layout is None else layout
+        positions = np.asarray(q, dtype=float) * (self.count - 1)
+        below, above = np.floor(positions), np.ceil(positions)
+        low = self._order_statistics(below, layout)
+        high = self._order_statistics(above, layout)
+        return low + (high - low) * (positions - below)
+
+    def stats(self, whis=1.5, label=None):
+        """Box statistics like box_stats, as a dict for Axes.bxp; None if the sketch is empty."""
+        if self.count == 0:
+            return None
+        layout = self._layout()
+        q1, med, q3 = self.quantiles([0.25, 0.5, 0.75], layout)
+        iqr = q3 - q1
+        low_limit, high_limit = q1 - whis * iqr, q3 + whis * iqr
+
+        # Whisker ends: the extreme values within the limits. They are exact whenever the kept
+        # tails reach inside the limits, i.e. unless more than `tail` values lie beyond them.
+        values, cumulative = layout
+        values = values[np.diff(cumulative, prepend=0) > 0]  # occupied buckets only
+        inside = self._high[self._high <= high_limit]
+        if len(inside) or len(self._high) == self.count:
+            whishi = inside.max() if len(inside) else q3
+        else:
+            candidates = values[values <= self._bucket_value(high_limit)]
+            whishi = min(candidates.max(), high_limit) if len(candidates) else q3
+        inside = self._low[self._low >= low_limit]
+        if len(inside) or len(self._low) == self.count:
+            whislo = inside.min() if len(inside) else q1
+        else:
+            candidates = values[values >= self._bucket_value(low_limit)]
+            whislo = max(candidates.min(), low_limit) if len(candidates) else q1
+        whishi, whislo = max(whishi, q3), min(whislo, q1)
+
+        fliers = np.concatenate((self._low[self._low < whislo], self._high[self._high > whishi]))
+        stats = {
+            "mean": self.total / self.count, "med": med, "q1": q1, "q3": q3, "iqr": iqr,
+            "whislo": whislo, "whishi": whishi, "fliers": fliers,
+        }
+        if label is not None:
+            stats["label"] = label
+        return stats
+
+
+class GroupedBoxSketch:
+    """One BoxSketch per group of `group_col`, updated with DataFrames (chunks) of a feed.
+
+    Attributes:
+        sketches: {group label: BoxSketch}, in order of appearance.
+    """
+
+    def __init__(self, group_col, value_col, relative_accuracy=RELATIVE_ACCURACY, tail=MAX_FLIERS):
+        self.group_col, self.value_col = group_col, value_col
+        self.relative_accuracy, self.tail = relative_accuracy, tail
+        self.sketches = {}
+
+    def _sketch(self, group):
+        if group not in self.sketches:
+            self.sketches[group] = BoxSketch(self.relative_accuracy, self.tail)
+        return self.sketches[group]
+
+    @traced("box_sketch_update")
+    def update(self, df):
+        """Add the values of the rows of `df` to the sketches of their groups; returns self."""
+        codes, groups = pd.factorize(df[self.group_col])
+        values = df[self.value_col].to_numpy(dtype=float, na_value=np.nan)
+        keep = (codes >= 0) & ~np.isnan(values)
+        codes, values = codes[keep], values[keep]
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(groups) + 1))
+        for code, group in enumerate(groups):
+            if bounds[code + 1] > bounds[code]:
+                self._sketch(group).update(values[order[bounds[code]:bounds[code + 1]]])
+        return self
+
+    def merge(self, other):
+        """Add the sketches of `other` group by group; returns self."""
+        for group, sketch in other.sketches.items():
+            self._sketch(group).merge(sketch)
+        return self
+
+    def stats(self, order=None, whis=1.5):
+        """Box statistics of the groups in `order` (default: order of appearance) that have values."""
+        order = self.sketches if order is None else order
+        return [self.sketches[group].stats(whis, label=group) for group in order if group in self.sketches]
+
+
+@traced()
+def group_box_stats(data, group_col, value_col, order=None, whis=1.5, exact_limit=EXACT_LIMIT,
+                    max_fliers=MAX_FLIERS, relative_accuracy=RELATIVE_ACCURACY, chunk_rows=CHUNK_ROWS):
+    """Box statistics of `value_col` per group of `group_col`, as a list of dicts for Axes.bxp.
+
+    `data` is a DataFrame or an iterable of DataFrame chunks (e.g. pd.read_csv(..., chunksize=n)).
+    A DataFrame of at most `exact_limit` rows is summarized exactly; anything else goes through a
+    GroupedBoxSketch, `chunk_rows` rows at a time. Groups are listed in `order` (default: order
+    of appearance); groups without values are left out. At most `max_fliers` outliers are kept
+    per side of every box.
+    """
+    if isinstance(data, pd.DataFrame) and len(data) <= exact_limit:
+        grouped = data.dropna(subset=[group_col]).groupby(group_col, observed=True, sort=False)[value_col]
+        values = {group: series.to_numpy(dtype=float, na_value=np.nan) for group, series in grouped}
+        order = values if order is None else order
+        stats = [box_stats(values[group], whis, group, max_fliers) for group in order if group in values]
+        return [box for box in stats if box is not None]
+
+    chunks = data
+    if isinstance(data, pd.DataFrame):
+        chunks = (data.iloc[start:start + chunk_rows] for start in range(0, len(data), chunk_rows))
+    sketches = GroupedBoxSketch(group_col, value_col, relative_accuracy, max_fliers)
+    for chunk in chunks:
+        sketches.update(chunk)
+    return [box for box in sketches.stats(order, whis) if box is not None]